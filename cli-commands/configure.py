@@ -13,11 +13,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import config.cli
+
 from opscli.command import *
 from opscli.context import *
 from opscli.options import *
+from opscli.tokens import *
 from opscli.flags import *
 from opscli.output import *
+import opscli.ovsdb as ovsdb
+import opscli.timing as timing
 
 
 class Configure(Command):
@@ -27,11 +32,97 @@ class Configure(Command):
     options = (
         Opt_one(
             ('terminal', 'Configure from terminal'),
+            ('candidate', 'Configure a candidate, written on commit'),
+        ),
+        Opt_all_order(
+            ('replace', 'Replace running configuration with a saved file'),
+            TFilename(help_text='Saved configuration file'),
         ),
     )
 
     def run(self, opts, flags):
+        while opts:
+            if opts[0] == 'replace':
+                self.replace(str(opts[1]))
+                return
+            elif opts[0] == 'candidate':
+                ovsdb.transaction_start()
+                context_push('config', leave=leave_candidate)
+                return
+            opts.pop(0)
+        context_push('config')
+
+    def replace(self, filename):
+        '''Apply only the difference between the running configuration and
+        the file, as a single transaction.'''
+        depth = len(context_names())
         context_push('config')
+        # In candidate mode the changes become part of the candidate.
+        candidate = ovsdb.transaction_active()
+        if not candidate:
+            ovsdb.transaction_start()
+        try:
+            running = config.cli.config_sections(config.cli.generate_config())
+            wanted = config.cli.config_sections(config.cli.load_config(
+                                                filename))
+            for line in config.cli.replace_lines(running, wanted):
+                if not line[0].isspace():
+                    # Top-level line, leave the previous block.
+                    while len(context_names()) > depth + 1:
+                        context_pop()
+                # Timed as part of configure replace.
+                timing.command_start(line.strip())
+                try:
+                    cmdobj, tokens, cmd_flags = self.cli.parse_command(
+                        line.split())
+                    cmdobj.run(tokens, cmd_flags)
+                except Exception as e:
+                    raise Exception(CLI_ERR_CONFIG_LINE % (line.strip(),
+                                    str(e)))
+                finally:
+                    timing.command_end()
+            if not candidate:
+                ovsdb.transaction_commit()
+        finally:
+            if not candidate:
+                ovsdb.transaction_abort()
+            while len(context_names()) > depth:
+                context_pop()
 
 
 register_commands((Configure,))
+
+
+def leave_candidate():
+    '''The candidate lasts as long as the config context it was made in.
+    Leaving that context is refused until the candidate's writes are
+    committed or aborted.'''
+    if ovsdb.transaction_pending():
+        raise Exception(CLI_ERR_CANDIDATE_PENDING)
+    ovsdb.transaction_abort()
+
+
+class Commit(Command):
+    '''Write the candidate configuration in one transaction'''
+    command = 'commit'
+
+    def run(self, opts, flags):
+        if not ovsdb.transaction_active():
+            raise Exception(CLI_ERR_NOCANDIDATE)
+        ovsdb.transaction_commit()
+        # Further changes make up the next candidate.
+        ovsdb.transaction_start()
+
+
+class Abort(Command):
+    '''Discard the candidate configuration'''
+    command = 'abort'
+
+    def run(self, opts, flags):
+        if not ovsdb.transaction_active():
+            raise Exception(CLI_ERR_NOCANDIDATE)
+        ovsdb.transaction_abort()
+        ovsdb.transaction_start()
+
+
+register_commands((Commit, Abort), tree='config')
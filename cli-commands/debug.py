@@ -13,30 +13,84 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
+import time
+import resource
+import cProfile
+import pstats
+
 from opscli.command import *
 from opscli.flags import *
 from opscli.options import *
+from opscli.tokens import *
 from opscli.output import *
+from opscli.stringhelp import Str_help
 from opscli.debug import *
+import opscli.ovsdb as ovsdb
+import opscli.trace as trace
+
+
+# Number of functions listed by 'debug profile'.
+PROFILE_TOP = 25
+
+
+class TDebug_key(TString):
+    '''A debug key, including keys registered after this module was
+    loaded.'''
+    def __init__(self, **kwargs):
+        Token.__init__(self, **kwargs)
+
+    @property
+    def allowed(self):
+        return [Str_help(key) for key in debug_available()]
 
 
 class Debug(Command):
-    '''Enable debug output for subsystems'''
+    '''Enable debug logging for subsystems'''
     command = 'debug'
     options = (
-        Opt_one(*debug_available()),
+        Opt_one(TDebug_key()),
+        Opt_one(*[(name, "Log %s messages and worse" % name)
+                  for name in LOG_LEVELS]),
     )
     flags = (F_NO, )
 
     def run(self, opts, flags):
         if not opts:
             raise Exception(CLI_ERR_INCOMPLETE)
-        full_list = debug_available()
-        for key in opts:
-            if F_NO in flags:
-                debug_disable(str(key))
-            else:
-                debug_enable(str(key))
+        key = str(opts[0])
+        if F_NO in flags:
+            debug_disable(key)
+        elif len(opts) > 1:
+            debug_enable(key, LOG_LEVELS[str(opts[1])])
+        else:
+            debug_enable(key)
+
+
+class Debug_log(Command):
+    '''Manage the debug log'''
+    command = 'debug log'
+    options = (
+        Opt_one(
+            ('console', 'Show debug messages as they are logged'),
+            ('clear', 'Clear the debug log'),
+        ),
+        Opt_all_order(
+            ('save', 'Append the debug log to a file, and clear it'),
+            TFilename(),
+        ),
+    )
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        if not opts:
+            raise Exception(CLI_ERR_INCOMPLETE)
+        if opts[0] == 'console':
+            debug_console(F_NO not in flags)
+        elif opts[0] == 'clear':
+            debug_log_clear()
+        elif opts[0] == 'save':
+            debug_log_save(opts[1].value)
 
 
 class Show_debug(Command):
@@ -44,8 +98,122 @@ class Show_debug(Command):
     command = 'show debug'
 
     def run(self, opts, flags):
-        for key in debug_enabled():
-            cli_out(key)
+        for key, level in debug_enabled():
+            cli_out("%s %s" % (key, level))
+        if ovsdb.analysis_enabled():
+            cli_out('Query analysis: on')
+        if debug_is_on('ovsdb'):
+            hits, misses, entries = ovsdb.cache_stats()
+            cli_out("OVSDB cache: %d hits, %d misses, %d cached" % (hits,
+                    misses, entries))
+
+
+class Show_debug_log(Command):
+    '''Show the debug log'''
+    command = 'show debug log'
+    options = (
+        Opt_one(TDebug_key()),
+    )
+
+    def run(self, opts, flags):
+        if opts:
+            records = debug_records(str(opts[0]))
+        else:
+            records = debug_records()
+        for record in records:
+            cli_out(format_record(record))
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def ovsdb_wait(stats):
+    '''Returns the time spent receiving from OVSDB in a profile, in
+    seconds. All replies are read through Ovsdb.receive_chunk().'''
+    ovsdb_file = os.path.splitext(ovsdb.__file__)[0]
+    for (filename, line, name), stat in stats.stats.items():
+        if (name == 'receive_chunk' and
+                os.path.splitext(filename)[0] == ovsdb_file):
+            # Cumulative time.
+            return stat[3]
+    return 0.0
+
+
+class Debug_profile(Command):
+    '''Profile a command'''
+    command = 'debug profile'
+    options = (
+        Opt_all_order(
+            ('save', 'Save the profile to a file'),
+            TFilename(help_text='Profile file (.pstats)'),
+        ),
+        Opt_any(TString(help_text='Command line')),
+    )
+
+    def run(self, opts, flags):
+        filename = None
+        if opts and opts[0] == 'save':
+            filename = opts[1].value
+            opts = opts[2:]
+        if not opts:
+            raise Exception(CLI_ERR_INCOMPLETE)
+        words = [opt.value for opt in opts]
+
+        profiler = cProfile.Profile()
+        start = time.time()
+        prompt_start = prompt_seconds()
+        cpu_start = cpu_time()
+        ret = profiler.runcall(self.cli.run_command, words)
+        cpu = cpu_time() - cpu_start
+        # Not counting the time spent reading at the pager prompt.
+        elapsed = time.time() - start - (prompt_seconds() - prompt_start)
+
+        stats = pstats.Stats(profiler, stream=Cli_stream())
+        # The profiler replaced the tracing hook, if any.
+        trace.install()
+        wait = ovsdb_wait(stats)
+        cli_out()
+        cli_out("Took %.1f ms: %.1f ms receiving from OVSDB, %.1f ms of "
+                "Python CPU time." % (elapsed * 1000, wait * 1000,
+                                      cpu * 1000))
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        if filename:
+            profiler.dump_stats(filename)
+            cli_out("Profile saved to %s." % filename)
+
+        return ret
+
+
+class Debug_queries(Command):
+    '''Report unused columns and redundant selects after every command'''
+    command = 'debug queries'
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        ovsdb.analysis_enable(F_NO not in flags)
+
+
+class Debug_trace(Command):
+    '''Trace commands into a file, for chrome://tracing'''
+    command = 'debug trace'
+    options = (
+        Opt_one(TFilename(help_text='Trace file (.json)')),
+    )
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        if F_NO in flags:
+            spans, dropped = trace.stop()
+            if dropped:
+                cli_warn("%d spans were dropped." % dropped)
+        elif not opts:
+            raise Exception(CLI_ERR_INCOMPLETE)
+        else:
+            trace.stop()
+            trace.start(opts[0].value)
 
 
-register_commands((Debug, Show_debug), tree='global')
+register_commands((Debug, Debug_log, Show_debug, Show_debug_log,
+                   Debug_profile, Debug_trace, Debug_queries), tree='global')
@@ -131,10 +131,7 @@ class Conf_lldp(Command):
                     sem = 'lldp_num_clear_counters_requested'
                 elif opts[1] == 'neighbors':
                     sem = 'lldp_num_clear_table_requested'
-                req = ovsdb.get_map('System', 'status')
-                counter = int(req.get(sem, 0))
-                counter += 1
-                ovsdb.map_set_key('System', 'status', sem, str(counter))
+                ovsdb.map_increment_key('System', 'status', sem)
                 opts.pop(0)
                 opts.pop(0)
 
@@ -156,38 +153,49 @@ class Interface_lldp(Command):
     def run(self, opts, flags):
         intf_token = context_get().obj
         condition = ['name', '==', str(intf_token)]
-        intf_other_map = ovsdb.get_map('Interface', 'other_config',
-                                       conditions=[condition])
-        # TODO should get 'rxtx' from defaults
-        old_state = intf_other_map.get('lldp_enable_dir', 'rxtx')
-        rx = tx = True
-        if old_state == 'off':
-            rx = tx = False
-        else:
-            if old_state.find('rx') == -1:
-                rx = False
-            if old_state.find('tx') == -1:
-                tx = False
-
+        set_rx = set_tx = None
         while opts:
             if opts[0] == 'reception':
-                rx = F_NO not in flags
+                set_rx = F_NO not in flags
                 opts.pop(0)
             elif opts[0] == 'transmission':
-                tx = F_NO not in flags
+                set_tx = F_NO not in flags
                 opts.pop(0)
 
-        if not rx and not tx:
-            new_state = 'off'
-        else:
-            new_state = ''
-            if rx:
-                new_state += 'rx'
-            if tx:
-                new_state += 'tx'
-        if old_state != new_state:
-            ovsdb.map_set_key('Interface', 'other_config', 'lldp_enable_dir',
-                              new_state, conditions=[condition])
+        def update_state(current):
+            # TODO should get 'rxtx' from defaults
+            if current is None:
+                old_state = 'rxtx'
+            else:
+                old_state = current
+            rx = tx = True
+            if old_state == 'off':
+                rx = tx = False
+            else:
+                if old_state.find('rx') == -1:
+                    rx = False
+                if old_state.find('tx') == -1:
+                    tx = False
+            if set_rx is not None:
+                rx = set_rx
+            if set_tx is not None:
+                tx = set_tx
+
+            if not rx and not tx:
+                new_state = 'off'
+            else:
+                new_state = ''
+                if rx:
+                    new_state += 'rx'
+                if tx:
+                    new_state += 'tx'
+            if new_state == old_state:
+                # Leave the map alone.
+                return current
+            return new_state
+
+        ovsdb.map_update_key('Interface', 'other_config', 'lldp_enable_dir',
+                             update_state, conditions=[condition])
 
 
 register_commands((Interface_lldp,), tree='interface')
@@ -0,0 +1,55 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from opscli.command import *
+from opscli.output import *
+import opscli.metrics as metrics
+
+
+class Show_cli(Command):
+    '''Information about this shell'''
+    command = 'show cli'
+
+
+class Show_cli_statistics(Command):
+    '''Counters and latencies since the shell started'''
+    command = 'show cli statistics'
+
+    def run(self, opts, flags):
+        for metric in metrics.all_metrics():
+            if not metric.values:
+                continue
+            cli_out("%s:" % metric.help_text)
+            if metric.kind == 'histogram':
+                title = list(metric.labels) + ['count', 'avg ms', 'max ms']
+            else:
+                title = list(metric.labels) + ['count']
+            rows = []
+            for label_values in sorted(metric.values):
+                row = [str(value) or '-' for value in label_values]
+                if metric.kind == 'histogram':
+                    counts, total, count, largest = metric.values[label_values]
+                    row.extend([str(count), "%.1f" % (total / count * 1000),
+                                "%.1f" % (largest * 1000)])
+                else:
+                    row.append(str(metric.values[label_values]))
+                rows.append(row)
+            if metric.labels:
+                out_table(rows, title, indent=2)
+            else:
+                cli_out("  %s" % rows[0][0])
+
+
+register_commands((Show_cli, Show_cli_statistics), tree='global')
@@ -16,6 +16,9 @@
 import config.cli
 
 from opscli.command import *
+from opscli.flags import *
+from opscli.options import *
+from opscli.tokens import *
 from opscli.output import *
 
 
@@ -36,9 +39,21 @@ subsystems = (
 class Show_running_config(Command):
     '''Current running configuration'''
     command = 'show running-configuration'
+    flags = (F_NO_OPTS_OK,)
+    options = (
+        Opt_all_order(
+            ('diff', 'Compare with a saved configuration file'),
+            TFilename(help_text='Saved configuration file'),
+        ),
+    )
 
     def run(self, opts, flags):
         lines = config.cli.generate_config()
+        if 'diff' in opts:
+            saved = config.cli.config_sections(
+                config.cli.load_config(str(opts[1])))
+            running = config.cli.config_sections(lines)
+            lines = config.cli.diff_sections(saved, running)
         for line in lines:
             line = line.replace('\t', INDENT)
             cli_out(line)
@@ -18,7 +18,7 @@ from opscli.flags import *
 from opscli.tokens import *
 from opscli.options import *
 from opscli.output import *
-from ops.interface import get_interface, get_interface_list
+from ops.interface import get_interface, iter_interfaces
 
 
 class Show_interface(Command):
@@ -49,14 +49,14 @@ class Show_interface(Command):
                     intf = opts[0]
                     keymap = 'mgmt-interface'
         if intf:
-            intflist = [intf]
+            interfaces = [(intf, get_interface(intf))]
         else:
-            intflist = get_interface_list()
+            # Output each interface as it comes in.
+            interfaces = iter_interfaces()
 
-        for intf in intflist:
+        for intf, data in interfaces:
             if 'transceiver' in opts:
                 keymap = 'interface-transceiver'
-            data = get_interface(intf)
             line = "Interface %s" % intf
             if 'brief' in opts:
                 # Show only the interface + oper and admin state.
@@ -0,0 +1,86 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from opscli.command import *
+from opscli.flags import *
+from opscli.options import *
+from opscli.tokens import *
+from opscli.output import *
+import opscli.timing as timing
+
+
+class Terminal(Command):
+    '''Set terminal settings for this session'''
+    command = 'terminal'
+
+
+class Terminal_timing(Command):
+    '''Show how long every command took'''
+    command = 'terminal timing'
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        timing.show_timing(F_NO not in flags)
+
+
+class Terminal_paging(Command):
+    '''Show command output a page at a time'''
+    command = 'terminal paging'
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        paging(F_NO not in flags)
+
+
+class Terminal_slow_log(Command):
+    '''Log commands slower than a threshold'''
+    command = 'terminal slow-log'
+    options = (
+        Opt_one(TInteger(help_text='Threshold in ms')),
+    )
+    flags = (F_NO, )
+
+    def run(self, opts, flags):
+        if F_NO in flags:
+            timing.set_slow_log(None)
+        elif not opts:
+            raise Exception(CLI_ERR_INCOMPLETE)
+        else:
+            timing.set_slow_log(opts[0].value)
+
+
+class Show_terminal(Command):
+    '''Show terminal settings'''
+    command = 'show terminal'
+
+    def run(self, opts, flags):
+        if timing.timing_shown():
+            cli_out('Timing: on')
+        else:
+            cli_out('Timing: off')
+        if paging_enabled():
+            cli_out('Paging: on')
+        else:
+            cli_out('Paging: off')
+        threshold = timing.slow_log_threshold()
+        if threshold is None:
+            cli_out('Slow log: off')
+        else:
+            cli_out("Slow log: commands over %d ms, in %s" % (threshold,
+                    timing.SLOW_LOG_FILE))
+
+
+register_commands((Terminal, Terminal_timing, Terminal_paging,
+                   Terminal_slow_log, Show_terminal), tree='global')
@@ -20,6 +20,7 @@ from opscli.options import *
 from opscli.context import *
 from opscli.output import *
 import opscli.ovsdb as ovsdb
+import ops.vlan
 
 
 class Shutdown(Command):
@@ -27,9 +28,12 @@ class Shutdown(Command):
     command = 'shutdown'
     flags = (F_NO,)
 
-    def run(self, opts, args):
-        cli_out("shutdown!")
-        cli_out(opts)
+    def run(self, opts, flags):
+        vlan_id = context_get().obj.value
+        if F_NO in flags:
+            ops.vlan.set_vlan_admin(vlan_id, 'up')
+        else:
+            ops.vlan.set_vlan_admin(vlan_id, 'down')
 
 
 register_commands((Shutdown,), tree='vlan')
@@ -45,8 +49,17 @@ class Conf_vlan(Command):
             required=True,
         ),
     )
+    flags = (F_NO, )
 
     def run(self, opts, flags):
+        if not isinstance(opts[0], TInteger):
+            return
+        vlan_id = opts[0].value
+        if F_NO in flags:
+            ops.vlan.delete_vlan(vlan_id)
+            return
+        if not ops.vlan.vlan_exists(vlan_id):
+            ops.vlan.create_vlan(vlan_id)
         context_push('vlan', obj=opts[0], prompt='config-vlan')
 
 
@@ -66,28 +79,35 @@ class Show_vlan(Command):
     )
 
     def run(self, opts, flags):
-        columns = ['id', 'name', 'oper_state', 'oper_state_reason']
-        query = []
+        vlan_id = None
         if opts:
             if opts[0] == 'internal':
                 self.show_vlan_internal()
                 return
             elif isinstance(opts[0].value, int):
-                query = [['id', '==', opts[0].value]]
-        rows = ovsdb.get('VLAN', columns, query)
+                vlan_id = opts[0].value
         if opts and opts[0] == 'summary':
+            rows = ovsdb.get('VLAN', ['id'])
             cli_out("Number of existing VLANs: %d" % len(rows))
+            return
+
+        vlans = ops.vlan.get_vlans(vlan_id)
+        if opts and len(vlans) == 0:
+            cli_out("VLAN %d has not been configured." % opts[0].value)
         else:
-            if opts and len(rows) == 0:
-                cli_out("VLAN %d has not been configured." % opts[0].value)
-            else:
-                col_data = []
-                for row in rows:
-                    col = []
-                    for name in columns:
+            col_data = []
+            for row, ports in vlans:
+                col = []
+                for name in ops.vlan.vlan_columns:
+                    if row[name] == frozenset():
+                        # Optional column, not set.
+                        col.append('')
+                    else:
                         col.append(str(row[name]))
-                    col_data.append(col)
-                out_table(col_data, title=['ID', 'Name', 'State', 'Reason'])
+                col.append(', '.join(ports))
+                col_data.append(col)
+            out_table(col_data, title=['ID', 'Name', 'State', 'Reason',
+                                       'Ports'])
 
     def show_vlan_internal(self):
         data = ovsdb.get_map('System', 'other_config')
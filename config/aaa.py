@@ -13,9 +13,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
-
 # TODO should be a global facility
 DEFAULTS = {
     'AAA_RADIUS': 'false',
@@ -24,10 +21,14 @@ DEFAULTS = {
     'SSH_AUTH_PUBKEY': 'enable',
 }
 
+READS = (
+    ('System', ['aaa']),
+)
+
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
-    results = ovsdb.get_map('System', column='aaa')
+    results = tables['System'][0].aaa
     aaa_config = (
         (
             'radius',
@@ -13,9 +13,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import hashlib
+import difflib
+from collections import OrderedDict
 from importlib import import_module
 
 from opscli.debug import logline
+import opscli.ovsdb as ovsdb
+from opscli.output import CLI_ERR_REPLACE_LINE
 
 
 INDENT = ' ' * 4
@@ -32,16 +37,224 @@ subsystems = (
     'interface',
 )
 
+# Top-level commands that open a configuration block of their own. All other
+# top-level lines are collected in the global section.
+SECTION_KEYWORDS = ('interface', 'vlan')
+GLOBAL_SECTION = ''
+# Leading words of the lines that commands can both set and undo, per kind
+# of section. A line is undone by the same line with 'no' added or removed.
+CHANGEABLE = {
+    GLOBAL_SECTION: ('lldp', ),
+    'interface': ('lldp', ),
+    'vlan': ('shutdown', ),
+}
+# Sections that are removed with 'no' and the line opening them. Others,
+# such as interfaces, can only have their lines undone.
+REMOVABLE_SECTIONS = ('vlan', )
 
-def dbg(msg):
-    logline('cli', msg)
+
+def dbg(msg, *args):
+    logline('cli', msg, *args)
 
 
 def generate_config():
-    lines = []
+    '''Returns the running configuration. Each subsystem declares the
+    columns it reads in READS, and is passed a dict of table to rows; the
+    rows for all subsystems are read in a single round trip.'''
+    modules = []
+    # table -> columns
+    reads = OrderedDict()
     for subsystem in subsystems:
-        dbg("calling subsystem %s" % subsystem)
         module = import_module('config.' + subsystem)
-        lines.extend(module.generate_cli())
+        modules.append(module)
+        for table, columns in module.READS:
+            if table not in reads:
+                reads[table] = []
+            for column in columns:
+                if column not in reads[table]:
+                    reads[table].append(column)
+    selects = []
+    for table, columns in reads.items():
+        selects.append((table, columns, []))
+    tables = {}
+    for table, rows in zip(reads, ovsdb.get_batch(selects)):
+        tables[table] = ovsdb.decode_rows(table, rows)
+
+    lines = []
+    for subsystem, module in zip(subsystems, modules):
+        dbg("calling subsystem %s", subsystem)
+        lines.extend(module.generate_cli(tables))
+
+    return lines
+
+
+class Config_section:
+    '''A top-level configuration block, and the lines in it.'''
+    def __init__(self, key):
+        self.key = key
+        self.lines = []
+        self._fingerprint = None
+
+    def __repr__(self):
+        return "<%s '%s'>" % (self.__class__.__name__, self.key)
+
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1('\n'.join(self.lines)).digest()
+        return self._fingerprint
+
+
+def load_config(filename):
+    '''Read a saved configuration, as written by show running-configuration.'''
+    f = open(filename)
+    lines = f.read().split('\n')
+    f.close()
+
+    return lines
+
+
+def config_sections(lines):
+    '''Split configuration lines into sections, keyed by the line that
+    opens the block, e.g. 'interface 1' or 'vlan 10'. Indentation is
+    normalized to a single tab, so saved and generated config compare
+    equal.'''
+    sections = OrderedDict()
+    sections[GLOBAL_SECTION] = Config_section(GLOBAL_SECTION)
+    current = sections[GLOBAL_SECTION]
+    for line in lines:
+        words = line.split()
+        if not words or words[0].startswith('!'):
+            # Blank line or comment.
+            continue
+        if line[0].isspace():
+            current.lines.append('\t' + ' '.join(words))
+            continue
+        key = ' '.join(words)
+        if words[0] in SECTION_KEYWORDS:
+            if key not in sections:
+                sections[key] = Config_section(key)
+            current = sections[key]
+        else:
+            current = sections[GLOBAL_SECTION]
+            current.lines.append(key)
+
+    return sections
+
+
+def diff_lines(old_lines, new_lines):
+    '''Line diff, without the unified diff file and hunk headers.'''
+    lines = []
+    for line in difflib.unified_diff(old_lines, new_lines, lineterm='', n=0):
+        if line.startswith('---') or line.startswith('+++'):
+            continue
+        if line.startswith('@@'):
+            continue
+        lines.append(line)
+
+    return lines
+
+
+def diff_sections(old, new):
+    '''Compare two sets of sections as returned by config_sections(). Only
+    sections whose fingerprints differ are compared line by line. Returns
+    a list of lines: removed lines are prefixed by '-', added lines by '+',
+    and the header of a block with changes in it by a space.'''
+    lines = []
+    keys = list(old)
+    for key in new:
+        if key not in old:
+            keys.append(key)
+    for key in keys:
+        old_section = old.get(key)
+        new_section = new.get(key)
+        if old_section is None:
+            # Block only in the new config.
+            lines.extend(diff_lines([], [key] + new_section.lines))
+        elif new_section is None:
+            # Block only in the old config.
+            lines.extend(diff_lines([key] + old_section.lines, []))
+        elif old_section.fingerprint() != new_section.fingerprint():
+            dbg("section '%s' changed", key)
+            if key != GLOBAL_SECTION:
+                lines.append(' ' + key)
+            lines.extend(diff_lines(old_section.lines, new_section.lines))
+
+    return lines
+
+
+def section_kind(key):
+    if key == GLOBAL_SECTION:
+        return GLOBAL_SECTION
+    return key.split()[0]
+
+
+def changeable(key, line):
+    '''Returns whether a line in section key can be set and undone.'''
+    words = line.split()
+    if words[0] == 'no':
+        words = words[1:]
+    return bool(words) and words[0] in CHANGEABLE.get(section_kind(key), ())
+
+
+def negate(line):
+    '''Return the command that undoes a configuration line.'''
+    words = line.split()
+    if words[0] == 'no':
+        command = ' '.join(words[1:])
+    else:
+        command = 'no ' + ' '.join(words)
+    if line[0].isspace():
+        command = '\t' + command
+
+    return command
+
+
+def replace_lines(old, new):
+    '''Returns the configuration lines needed to turn the old set of sections
+    into the new one, as returned by config_sections(). Lines in a block
+    are preceded by the line opening that block. Sections with matching
+    fingerprints need no lines at all.
+
+    Blocks missing from the new set are removed if their kind can be, and
+    otherwise have their lines negated. If a line that differs has no
+    command to set or undo it, an exception is raised before any lines are
+    returned, as the result would not match the new set.'''
+    lines = []
+    keys = list(new)
+    for key in old:
+        if key not in new:
+            keys.append(key)
+    for key in keys:
+        old_section = old.get(key)
+        new_section = new.get(key)
+        if old_section is None:
+            old_lines = []
+        else:
+            old_lines = old_section.lines
+        if new_section is None:
+            new_lines = []
+        else:
+            new_lines = new_section.lines
+        if old_section is not None and new_section is not None:
+            if old_section.fingerprint() == new_section.fingerprint():
+                continue
+        if new_section is None and section_kind(key) in REMOVABLE_SECTIONS:
+            lines.append('no ' + key)
+            continue
+        removed = []
+        added = []
+        for line in diff_lines(old_lines, new_lines):
+            if not changeable(key, line[1:]):
+                raise Exception(CLI_ERR_REPLACE_LINE % line[1:].strip())
+            if line[0] == '-':
+                removed.append(negate(line[1:]))
+            else:
+                added.append(line[1:])
+        if key != GLOBAL_SECTION:
+            lines.append(key)
+        elif not removed and not added:
+            continue
+        lines.extend(removed)
+        lines.extend(added)
 
     return lines
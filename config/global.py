@@ -13,22 +13,21 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
+READS = (
+    ('System', ['mgmt_intf_status']),
+    ('CLI_Alias', ['alias_name', 'alias_definition']),
+)
 
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
 
     # hostname
-    results = ovsdb.get_map('System', column='mgmt_intf_status')
+    results = tables['System'][0].mgmt_intf_status
     lines.append("hostname %s" % results.get('hostname', ''))
 
     # alias
-    results = ovsdb.get('CLI_Alias', columns=['alias_name',
-                        'alias_definition'])
-    for row in results:
-        lines.append("alias %s %s" % (row['alias_name'],
-                     row['alias_definition']))
+    for row in tables['CLI_Alias']:
+        lines.append("alias %s %s" % (row.alias_name, row.alias_definition))
 
     return lines
@@ -13,23 +13,23 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
+READS = (
+    ('Interface', ['name', 'other_config']),
+)
 
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
-    results = ovsdb.get('Interface')
-    for row in results:
+    for row in tables['Interface']:
         intf = []
-        for key, value in row['other_config'][1]:
-            if key == 'lldp_enable_dir':
-                if value == 'off' or value.find('rx') == -1:
-                    intf.append("\tno lldp reception")
-                if value == 'off' or value.find('tx') == -1:
-                    intf.append("\tno lldp transmission")
+        value = row.other_config.get('lldp_enable_dir')
+        if value is not None:
+            if value == 'off' or value.find('rx') == -1:
+                intf.append("\tno lldp reception")
+            if value == 'off' or value.find('tx') == -1:
+                intf.append("\tno lldp transmission")
         if intf:
-            lines.append("interface %s" % row['name'])
+            lines.append("interface %s" % row.name)
             lines.extend(intf)
 
     return lines
@@ -13,13 +13,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
+READS = (
+    ('System', ['lacp_config']),
+)
 
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
-    results = ovsdb.get_map('System', column='lacp_config')
+    results = tables['System'][0].lacp_config
     val = results.get('lacp-system-priority')
     if val:
         lines.append("lacp system-priority %s" % val)
@@ -13,16 +13,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
-
 # TODO
 from ops.lldp import DEFAULTS
 
+READS = (
+    ('System', ['other_config']),
+)
+
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
-    results = ovsdb.get_map('System', column='other_config')
+    results = tables['System'][0].other_config
     if results.get('lldp_enable', '') == 'true':
         lines.append('lldp enable')
 
@@ -13,9 +13,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
-
 # TODO should be a global facility
 DEFAULTS = {
     'LOGROTATE_MAXSIZE': '10',
@@ -23,10 +20,14 @@ DEFAULTS = {
     'LOGROTATE_TARGET': 'local',
 }
 
+READS = (
+    ('System', ['logrotate_config']),
+)
+
 
-def generate_cli():
+def generate_cli(tables):
     lines = []
-    results = ovsdb.get_map('System', column='logrotate_config')
+    results = tables['System'][0].logrotate_config
     logrotate_config = (
         ['period', 'LOGROTATE_PERIOD', 'period'],
         ['maxsize', 'LOGROTATE_MAXSIZE', 'maxsize'],
@@ -13,22 +13,23 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
+radius_keys = (
+    ('passkey', 'key'),
+    ('udp_port', 'auth_port'),
+    ('priority', 'priority'),
+    ('retries', 'retries'),
+    ('timeout', 'timeout'),
+)
 
+READS = (
+    ('Radius_Server', ['ip_address'] + [key for key, word in radius_keys]),
+)
 
-def generate_cli():
+
+def generate_cli(tables):
     lines = []
-    radius_keys = (
-        ('passkey', 'key'),
-        ('udp_port', 'auth_port'),
-        ('priority', 'priority'),
-        ('retries', 'retries'),
-        ('timeout', 'timeout'),
-    )
-    results = ovsdb.get('Radius_Server')
-    for row in results:
-        host = row['ip_address']
+    for row in tables['Radius_Server']:
+        host = row.ip_address
         line = "radius-server %s" % host
         for key, word in radius_keys:
             val = row.get(key)
@@ -13,18 +13,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-# TODO
-import opscli.ovsdb as ovsdb
+READS = (
+    ('VLAN', ['id', 'admin']),
+)
 
 
-def generate_cli():
-    columns = ['id', 'admin']
-    rows = ovsdb.get('VLAN', columns)
+def generate_cli(tables):
     lines = []
     vlans = {}
-    for row in rows:
-        vlan_id = int(row['id'])
-        vlans[vlan_id] = row['admin']
+    for row in tables['VLAN']:
+        vlans[row.id] = row.admin
     for vlan_id in sorted(vlans):
         lines.append("vlan %s" % vlan_id)
         if vlans[vlan_id] == 'up':
@@ -22,16 +22,23 @@ intf_keys = [
     'admin_state', 'link_state', 'link_speed', 'link_resets',
     'duplex', 'mac_in_use'
 ]
+# Columns read by interface_data().
+intf_columns = ['name', 'hw_intf_info'] + intf_keys
 
 mgmt_intf_keys = [
     'link_state', 'ip', 'subnet_mask', 'default_gateway',
     'ipv6_linklocal'
 ]
 
+interface_names = ovsdb.Prepared_select('Interface', columns=['name'])
+interface_by_name = ovsdb.Prepared_select('Interface', intf_columns, [
+    ['name', '==', ovsdb.Param('name')],
+])
+
 
 def get_interface_list():
     intflist = []
-    response = ovsdb.get('Interface', columns=['name'])
+    response = interface_names.get()
     for row in response:
         intflist.append(row['name'])
     return intflist
@@ -40,20 +47,31 @@ def get_interface_list():
 def get_interface(intf):
     data = {}
     if intf == 'mgmt':
-        results = ovsdb.get('System', columns=['mgmt_intf_status'])
-        for key, value in results[0]['mgmt_intf_status'][1]:
-            if key in mgmt_intf_keys:
-                data[key] = value
+        results = ovsdb.get_map('System', 'mgmt_intf_status')
+        for key in mgmt_intf_keys:
+            if key in results:
+                data[key] = results[key]
         data['ip'] += '/' + data['subnet_mask']
         data.pop('subnet_mask')
     else:
-        conditions = [['name', '==', str(intf)]]
-        results = ovsdb.get('Interface', conditions=conditions)[0]
-        for key in intf_keys:
-            if key in results:
-                data[key] = results[key]
-        # Transceiver information.
-        for key, value in results['hw_intf_info'][1]:
-            data[key] = value
+        row = interface_by_name.get_rows(name=str(intf))[0]
+        data = interface_data(row)
+
+    return data
+
+
+def interface_data(row):
+    data = {}
+    for key in intf_keys:
+        if key in row:
+            data[key] = row[key]
+    # Transceiver information.
+    data.update(row.hw_intf_info)
 
     return data
+
+
+def iter_interfaces():
+    '''Yields (name, data) for every interface, as they are received.'''
+    for row in ovsdb.iter_rows('Interface', intf_columns):
+        yield row.name, interface_data(row)
@@ -130,15 +130,11 @@ def get_intf_config(intf=None):
         conditions = [['name', '==', str(intf)]]
     else:
         conditions = []
-    rows = ovsdb.get('Interface', columns=['name', 'other_config'],
-                     conditions=conditions)
+    rows = ovsdb.get_rows('Interface', columns=['name', 'other_config'],
+                          conditions=conditions)
     for row in rows:
         # TODO should get 'rxtx' from defaults
-        state = 'rxtx'
-        for key, value in row['other_config'][1]:
-            if key == 'lldp_enable_dir':
-                state = value
-                break
+        state = row.other_config.get('lldp_enable_dir', 'rxtx')
         if state == 'off':
             rx = tx = False
         else:
@@ -147,7 +143,7 @@ def get_intf_config(intf=None):
                 rx = False
             if state.find('tx') == -1:
                 tx = False
-        results[row['name']] = (rx, tx)
+        results[row.name] = (rx, tx)
 
     return results
 
@@ -166,11 +162,12 @@ def get_intf_stats(intf=None):
         conditions = [['name', '==', str(intf)]]
     else:
         conditions = []
-    rows = ovsdb.get('Interface', columns=['name', 'lldp_statistics'],
-                     conditions=conditions)
+    rows = ovsdb.get_rows('Interface', columns=['name', 'lldp_statistics'],
+                          conditions=conditions)
     for row in rows:
-        intf_name = row['name']
-        for key, value in row['lldp_statistics'][1]:
+        intf_name = row.name
+        results[intf_name] = {}
+        for key, value in row.lldp_statistics.items():
             results[intf_name][key] = value
             if key in totals:
                 totals[key] += value
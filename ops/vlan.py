@@ -0,0 +1,132 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+This module provides access to VLANs.
+'''
+
+import re
+
+import opscli.ovsdb as ovsdb
+
+vlan_columns = ['id', 'name', 'oper_state', 'oper_state_reason']
+
+# Port columns referring to the VLANs the port is a member of.
+port_vlan_columns = ('vlan_tag', 'vlan_trunks')
+
+
+def get_vlans(vlan_id=None):
+    '''
+    Returns a list of (VLAN row, member port names), sorted by VLAN id.
+    This takes at most three round trips, regardless of the number of VLANs
+    and ports.
+    '''
+    if vlan_id is not None:
+        return get_vlan(vlan_id)
+
+    resolver = ovsdb.Resolver()
+    vlans = resolver.get('VLAN', vlan_columns)
+    ports = resolver.get('Port', ['name'] + list(port_vlan_columns))
+
+    # VLAN id -> port names
+    members = {}
+    for column in port_vlan_columns:
+        # The VLANs were all fetched above, so this only needs a round trip
+        # for those added since.
+        port_vlans = resolver.follow(ports, column, 'VLAN', vlan_columns)
+        for port in ports:
+            for uuid in ovsdb.references(getattr(port, column)):
+                vlan = port_vlans.get(uuid)
+                if vlan is None:
+                    # Deleted since the ports were read.
+                    continue
+                if vlan.id not in members:
+                    members[vlan.id] = []
+                if port.name not in members[vlan.id]:
+                    members[vlan.id].append(port.name)
+
+    results = []
+    for vlan in sorted(vlans, key=vlan_sort_key):
+        results.append((vlan, sorted(members.get(vlan.id, []),
+                                     key=port_sort_key)))
+
+    return results
+
+
+def get_vlan(vlan_id):
+    '''Like get_vlans(), for a single VLAN. Only the ports in the VLAN are
+    read.'''
+    vlans = ovsdb.get_rows('VLAN', vlan_columns + ['_uuid'],
+                           [['id', '==', vlan_id]])
+    if not vlans:
+        return []
+    vlan = vlans[0]
+    uuid = vlan._uuid.wire()
+    replies = ovsdb.get_batch([
+        ('Port', ['name'], [['vlan_tag', '==', uuid]]),
+        ('Port', ['name'], [['vlan_trunks', 'includes', uuid]]),
+    ])
+    names = set()
+    for rows in replies:
+        for row in rows:
+            names.add(row['name'])
+
+    return [(vlan, sorted(names, key=port_sort_key))]
+
+
+def vlan_exists(vlan_id):
+    return len(ovsdb.get('VLAN', ['id'], [['id', '==', vlan_id]])) > 0
+
+
+def create_vlan(vlan_id):
+    '''Add a VLAN, administratively down.'''
+    ovsdb.insert('VLAN', {
+        'id': vlan_id,
+        'name': "VLAN%d" % vlan_id,
+        'admin': 'down',
+    })
+
+
+def delete_vlan(vlan_id):
+    '''Remove a VLAN, and take all ports out of it.'''
+    rows = ovsdb.get('VLAN', ['_uuid'], [['id', '==', vlan_id]])
+    for row in rows:
+        uuid = row['_uuid']
+        ovsdb.update('Port', {'vlan_tag': ['set', []]},
+                     [['vlan_tag', '==', uuid]])
+        ovsdb.mutate_map('Port', [['vlan_trunks', 'delete', uuid]],
+                         [['vlan_trunks', 'includes', uuid]])
+    ovsdb.delete('VLAN', [['id', '==', vlan_id]])
+
+
+def set_vlan_admin(vlan_id, state):
+    '''Set a VLAN administratively 'up' or 'down'.'''
+    ovsdb.update('VLAN', {'admin': state}, [['id', '==', vlan_id]])
+
+
+def vlan_sort_key(vlan):
+    return vlan.id
+
+
+def port_sort_key(name):
+    '''Sort port names by the numbers in them, so that 2 comes before 10
+    and 1-2 before 1-10.'''
+    key = []
+    for part in re.split(r'(\d+)', name):
+        if part.isdigit():
+            key.append(int(part))
+        else:
+            key.append(part)
+
+    return key
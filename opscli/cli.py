@@ -15,6 +15,7 @@
 
 import sys
 import os
+import time
 from collections import OrderedDict
 
 from pyrepl.reader import Reader
@@ -30,7 +31,13 @@ from opscli.output import *
 from opscli.tokens import *
 from opscli.options import *
 import opscli.ovsdb as ovsdb
+import opscli.transcript as transcript
+import opscli.startup as startup
+import opscli.timing as timing
+import opscli.trace as trace
+import opscli.metrics as metrics
 from opscli.debug import logline, debug_is_on
+from opscli.exceptions import EPagerQuit
 from stdcmd import Exit
 
 
@@ -40,21 +47,31 @@ HISTORY_SIZE = 1000
 DEBUG_TRACEBACK = False
 
 
-def dbg(msg):
-    logline('cli', msg)
+def dbg(msg, *args):
+    logline('cli', msg, *args)
 
 
 class Opscli(HistoricalReader):
     '''
     This class extends pyrepl's Reader to provide command modules.
     '''
-    def __init__(self, ovsdb_server, command_module_paths=None):
-        super(Opscli, self).__init__(UnixConsole())
+    def __init__(self, ovsdb_server, command_module_paths=None,
+                 interactive=True, console=None):
+        # Without a console, only process_line() can be used.
+        startup.phase_start('console')
+        if console is None and interactive:
+            console = UnixConsole()
+        super(Opscli, self).__init__(console)
+        self.interactive = interactive
+        # Whether the last command line failed.
+        self.failed = False
         self.fix_syntax_table()
+        startup.phase_end()
         # Initialize the OVSDB helper.
         ovsdb.Ovsdb(server=ovsdb_server)
         self.motd = CLI_MSG_MOTD
         self.prompt_base = 'Openswitch'
+        startup.phase_start('ovsdb hostname query')
         try:
             # TODO shell hangs before prompt if this is down
             results = ovsdb.get_map('System', column='mgmt_intf_status')
@@ -63,22 +80,32 @@ class Opscli(HistoricalReader):
         except Exception as e:
             cli_err("Unable to connect to %s: %s." % (ovsdb_server, str(e)))
             raise Exception
+        finally:
+            startup.phase_end()
 
         # Initialize command tree.
         for path in command_module_paths:
             if not os.path.isdir(path):
                 cli_warn("Ignoring invalid module path '%s'." % path)
                 continue
+            startup.phase_start("load_commands %s" % path)
             self.load_commands(path)
+            startup.phase_end()
+        startup.phase_start('fixup_contexts')
         self.fixup_contexts()
         context_push('root')
+        startup.phase_end()
         if debug_is_on('cli'):
             context_get().cmdtree.dump_tree()
 
+        startup.phase_start('key bindings')
         self.init_ctrl_c()
         self.init_qhelp()
         self.init_completion()
+        startup.phase_end()
+        startup.phase_start('init_history')
         self.init_history()
+        startup.phase_end()
 
     def fix_syntax_table(self):
         '''The default pyrepl syntax table only considers a-z as word
@@ -89,11 +116,16 @@ class Opscli(HistoricalReader):
 
     def load_commands(self, path):
         sys.path.insert(0, path)
+        trace.add_command_path(path)
         for filename in os.listdir(path):
             if filename[-3:] != '.py':
                 continue
             # Strip '.py'.
-            __import__(filename[:-3])
+            startup.phase_start("import %s" % filename[:-3])
+            try:
+                __import__(filename[:-3])
+            finally:
+                startup.phase_end()
 
     def fixup_contexts(self):
         '''Add exit command to every non-root command tree.'''
@@ -117,6 +149,7 @@ class Opscli(HistoricalReader):
             def do(self):
                 line = ''.join(self.reader.buffer)
                 cli_wrt('\r\n')
+                ovsdb.query_scope_start()
                 try:
                     items = self.cli.qhelp(line)
                     cli_help(items, end='\r\n')
@@ -124,6 +157,8 @@ class Opscli(HistoricalReader):
                     cli_wrt(str(e) + '\r\n')
                     if DEBUG_TRACEBACK:
                         raise
+                finally:
+                    ovsdb.query_scope_end()
                 cli_wrt(self.cli.make_prompt())
                 cli_wrt(line)
         self.bind(r'?', 'qhelp')
@@ -147,8 +182,10 @@ class Opscli(HistoricalReader):
 
                 cmd_complete = False
                 cmdobj = matches[0]
-                for key in cmdobj.branch:
-                    items.append(self.helpline(cmdobj.branch[key], words))
+                if len(words) == len(cmdobj.command):
+                    # Subcommands can only follow the command itself.
+                    for key in cmdobj.branch:
+                        items.append(self.helpline(cmdobj.branch[key], words))
                 if hasattr(cmdobj, 'options'):
                     opt_words = words[len(cmdobj.command):]
                     if not opt_words and F_NO_OPTS_OK in cmdobj.flags:
@@ -203,12 +240,15 @@ class Opscli(HistoricalReader):
 
             def do(self):
                 line = ''.join(self.reader.buffer)
+                ovsdb.query_scope_start()
                 try:
                     self.cli.complete(line)
                 except Exception as e:
                     cli_wrt(str(e) + '\r\n')
                     if DEBUG_TRACEBACK:
                         raise
+                finally:
+                    ovsdb.query_scope_end()
         self.bind(r'\t', 'complete')
         self.commands['complete'] = rdr_complete
 
@@ -319,7 +359,16 @@ class Opscli(HistoricalReader):
         prompt = self.prompt_base + context_string + PROMPT_CHAR
         return prompt
 
+    def refresh(self):
+        super(Opscli, self).refresh()
+        if startup.active():
+            # The first prompt is on screen, which is as far as startup
+            # profiling goes.
+            startup.phase_end()
+            raise EOFError
+
     def start_shell(self):
+        startup.phase_start('first prompt')
         cli_out(self.motd)
         while True:
             try:
@@ -331,8 +380,11 @@ class Opscli(HistoricalReader):
                         break
                 break
             except EOFError:
-                # ctrl-d quits the shell.
-                break
+                # ctrl-d quits the shell, unless a candidate would be lost.
+                if not ovsdb.transaction_pending():
+                    break
+                cli_out()
+                cli_err(CLI_ERR_CANDIDATE_PENDING)
             except KeyboardInterrupt:
                 # ctrl-c throws away the current line and prompts again.
                 cli_out('^C')
@@ -345,12 +397,17 @@ class Opscli(HistoricalReader):
         f.close()
 
     def process_line(self, line):
+        '''Run a command line. Returns False if the shell should quit, and
+        sets self.failed if the command failed.'''
         words = line.split()
         dbg(words)
+        self.failed = False
         if words:
+            transcript.record_command(line)
             try:
                 return self.run_command(words)
             except Exception as e:
+                self.failed = True
                 if DEBUG_TRACEBACK:
                     raise
                 else:
@@ -375,6 +432,10 @@ class Opscli(HistoricalReader):
                     # Continue matching on this branch with the next word.
                     return self.find_partial_command(cmdobj.branch[key],
                                                      words[1:], matches)
+        if not matches and hasattr(cmdobj, 'run'):
+            # None of the subcommands match, but this command can run on
+            # its own: the rest of the words are its options.
+            matches.append(cmdobj)
         return matches
 
     def find_command(self, cmdobj, words):
@@ -403,11 +464,9 @@ class Opscli(HistoricalReader):
 
         return matches
 
-    def run_command(self, words):
-        if words[0] == 'help':
-            self.show_help(words[1:])
-            return True
-
+    def parse_command(self, words):
+        '''Find the command for words in the current context, and tokenize
+        its options. Returns the command object, tokens and flags.'''
         flags = []
         # Negated commands are in the tree without the leading 'no'.
         if words[0] == 'no':
@@ -416,6 +475,7 @@ class Opscli(HistoricalReader):
 
         cmdtree = context_get().cmdtree
         matches = self.find_command(cmdtree, words)
+        timing.mark('lookup')
         if len(matches) == 0 or len(matches) > 1:
             # Either nothing matched, or more than one command matched.
             raise Exception(CLI_ERR_NOCOMMAND)
@@ -438,15 +498,61 @@ class Opscli(HistoricalReader):
             if flag not in cmdobj.flags:
                 # Something was flagged, but the command doesn't allow it.
                 raise Exception(CLI_ERR_NOCOMMAND)
+        # Make this shell available to the command.
+        cmdobj.cli = self
+        timing.mark('parse')
+
+        return cmdobj, tokens, flags
+
+    def run_command(self, words):
+        if words[0] == 'help':
+            self.show_help(words[1:])
+            return True
+
+        timing.command_start(' '.join(words))
+        trace.command_start(words)
+        start = time.time()
+        prompt_start = prompt_seconds()
+        cmdobj = None
+        # Database reads are shared for the duration of the command.
+        ovsdb.query_scope_start()
+        ovsdb.analysis_start()
         try:
-            # Run command.
-            ret = cmdobj.run(tokens, flags)
-        except Exception as e:
-            if DEBUG_TRACEBACK:
+            try:
+                cmdobj, tokens, flags = self.parse_command(words)
+            except Exception:
+                metrics.parse_failures.inc()
                 raise
-            else:
-                cli_err(str(e))
+            if self.interactive:
+                pager_start()
+            try:
+                # Run command.
+                ret = cmdobj.run(tokens, flags)
+                timing.mark('run')
+            except EPagerQuit:
+                # The rest of the output was not wanted.
                 return True
+            except Exception as e:
+                self.failed = True
+                if DEBUG_TRACEBACK:
+                    raise
+                else:
+                    cli_err(str(e))
+                    return True
+            finally:
+                pager_end()
+        finally:
+            ovsdb.query_scope_end()
+            for line in ovsdb.analysis_end():
+                cli_out(line)
+            timing.command_end()
+            trace.command_end()
+            if cmdobj is not None:
+                seconds = (time.time() - start -
+                           (prompt_seconds() - prompt_start))
+                metrics.command_seconds.observe(seconds,
+                                                (cmdobj.__class__.__name__, ))
+            metrics.export(force=False)
 
         # Most commands just return None, which is fine.
         return ret is not False
@@ -466,8 +572,10 @@ class Opscli(HistoricalReader):
         else:
             matches = self.find_command(cmdtree, words)
             if len(matches) == 0:
+                self.failed = True
                 cli_err(CLI_ERR_NOHELP_UNK)
             elif len(matches) > 1:
+                self.failed = True
                 cli_err(CLI_ERR_AMBIGUOUS)
             else:
                 cli_out(matches[0].__doc__)
@@ -18,12 +18,13 @@ from collections import OrderedDict
 from opscli.options import Option
 from opscli.tokens import Token
 from opscli.debug import logline
+import opscli.startup as startup
 
 _command_trees = {}
 
 
-def dbg(msg):
-    logline('cli', msg)
+def dbg(msg, *args):
+    logline('cli', msg, *args)
 
 
 def list_cmdtrees():
@@ -39,15 +40,19 @@ def get_cmdtree(name):
 def register_commands(commands, tree='root'):
     if not isinstance(commands, tuple):
         raise Exception("commands must be in a tuple")
+    startup.phase_start("register_commands %s" % tree)
     if tree not in _command_trees:
         _command_trees[tree] = Command(tree)
     cmdtree = _command_trees[tree]
-    for cmdclass in commands:
-        try:
-            cmdtree.insert_command(cmdclass)
-        except Exception as e:
-            raise Exception("failed to add command '%s': %s." % (
-                            cmdclass.__name__, str(e)))
+    try:
+        for cmdclass in commands:
+            try:
+                cmdtree.insert_command(cmdclass)
+            except Exception as e:
+                raise Exception("failed to add command '%s': %s." % (
+                                cmdclass.__name__, str(e)))
+    finally:
+        startup.phase_end()
 
     return cmdtree
 
@@ -76,8 +81,8 @@ class Command:
     def dump_tree(self, cmdobj=None, level=0):
         if cmdobj is None:
             cmdobj = self
-        dbg("%s%s %s %s {%s...}" % ('    ' * level, ' '.join(cmdobj.command),
-            cmdobj.options, cmdobj.flags, cmdobj.__doc__[:10]))
+        dbg("%s%s %s %s {%s...}", '    ' * level, ' '.join(cmdobj.command),
+            cmdobj.options, cmdobj.flags, cmdobj.__doc__[:10])
         for cmd in cmdobj.branch:
             self.dump_tree(cmdobj.branch[cmd], level + 1)
 
@@ -107,7 +112,7 @@ class Command:
     # Instantiate a Command object in the right place
     def insert_command(self, cmdclass):
         self.check_command(cmdclass)
-        dbg("adding %s:%s." % (self.command[0], cmdclass.__name__))
+        dbg("adding %s:%s.", self.command[0], cmdclass.__name__)
         prev = None
         cur = self
         for word in cmdclass.command.split():
@@ -19,14 +19,18 @@ from opscli.cli import get_cmdtree
 _contexts = []
 
 
-def context_push(name, obj=None, prompt=None):
-    _contexts.append(Context(name, obj=obj, prompt=prompt))
+def context_push(name, obj=None, prompt=None, leave=None):
+    '''Enter a context. If given, leave() is called when the context is
+    left, and can keep the user in it by raising an exception.'''
+    _contexts.append(Context(name, obj=obj, prompt=prompt, leave=leave))
 
 
 def context_pop():
     if not _contexts:
         return False
     else:
+        if _contexts[-1].leave is not None:
+            _contexts[-1].leave()
         _contexts.pop()
         return True
 
@@ -50,8 +54,9 @@ def context_names():
 
 
 class Context:
-    def __init__(self, name, obj=None, prompt=None):
+    def __init__(self, name, obj=None, prompt=None, leave=None):
         self.name = name
         self.cmdtree = get_cmdtree(name)
         self.obj = obj
         self.prompt = prompt
+        self.leave = leave
@@ -12,27 +12,74 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+'''
+Debug logging, per subsystem key and level.
 
-_debug_keys = (
-    'cli',
-    'ovsdb'
-)
+Messages are only formatted when their key is enabled at their level, so
+callers pass the format arguments separately:
 
+    logline('ovsdb', "Received %d bytes.", len(chunk))
+
+Records are kept in a ring buffer, and optionally shown on the console as
+they are logged.
+'''
+
+import time
+from collections import OrderedDict, deque
+
+
+LOG_ERROR = 1
+LOG_WARNING = 2
+LOG_INFO = 3
+LOG_DEBUG = 4
+
+LOG_LEVELS = OrderedDict((
+    ('error', LOG_ERROR),
+    ('warning', LOG_WARNING),
+    ('info', LOG_INFO),
+    ('debug', LOG_DEBUG),
+))
+
+# Number of records kept.
+DEBUG_LOG_SIZE = 1000
+# Longer messages are cut off.
+DEBUG_MSG_MAX = 512
+
+# key -> help text
+_debug_keys = OrderedDict((
+    ('cli', 'Command parsing and dispatch'),
+    ('ovsdb', 'OVSDB requests and replies'),
+))
+
+# key -> level
 _dbg_enabled = {}
+_dbg_console = False
+# (time, key, level, message)
+_dbg_records = deque(maxlen=DEBUG_LOG_SIZE)
+
+
+def debug_register(key, help_text=None):
+    '''Make a debug key available, for a subsystem of its own.'''
+    _debug_keys[key] = help_text
 
 
 def debug_available():
-    return tuple(sorted(_debug_keys))
+    '''Returns the debug keys as (key, help text).'''
+    return tuple(sorted(_debug_keys.items()))
 
 
 def debug_enabled():
-    return sorted(_dbg_enabled.keys())
+    '''Returns the enabled debug keys as (key, level name).'''
+    results = []
+    for key in sorted(_dbg_enabled):
+        results.append((key, level_name(_dbg_enabled[key])))
+    return results
 
 
-def debug_enable(key):
+def debug_enable(key, level=LOG_DEBUG):
     if key not in _debug_keys:
         raise Exception("Invalid debug key")
-    _dbg_enabled[key] = True
+    _dbg_enabled[key] = level
 
 
 def debug_disable(key):
@@ -42,13 +89,69 @@ def debug_disable(key):
 
 
 def debug_disable_all():
-    _dbg_enabed.clear()
+    _dbg_enabled.clear()
 
 
-def debug_is_on(key):
-    return key in _dbg_enabled
+def debug_is_on(key, level=LOG_DEBUG):
+    return _dbg_enabled.get(key, 0) >= level
 
 
-def logline(key, msg):
-    if key in _dbg_enabled:
+def debug_console(enable):
+    '''Show records on the console as they are logged.'''
+    global _dbg_console
+    _dbg_console = enable
+
+
+def level_name(level):
+    for name, value in LOG_LEVELS.items():
+        if value == level:
+            return name
+    return str(level)
+
+
+def log(key, level, msg, *args):
+    if _dbg_enabled.get(key, 0) < level:
+        return
+    if args:
+        msg = msg % args
+    else:
+        msg = str(msg)
+    if len(msg) > DEBUG_MSG_MAX:
+        msg = msg[:DEBUG_MSG_MAX] + '...'
+    _dbg_records.append((time.time(), key, level, msg))
+    if _dbg_console:
         print "DBG: %s: %s" % (key, msg)
+
+
+def logline(key, msg, *args):
+    if key in _dbg_enabled:
+        log(key, LOG_DEBUG, msg, *args)
+
+
+def debug_records(key=None):
+    '''Returns the logged records, oldest first, as (time, key, level,
+    message).'''
+    if key is None:
+        return list(_dbg_records)
+    return [record for record in _dbg_records if record[1] == key]
+
+
+def format_record(record):
+    stamp, key, level, msg = record
+    return "%s.%03d %s %s: %s" % (time.strftime('%H:%M:%S',
+                                  time.localtime(stamp)),
+                                  int(stamp * 1000) % 1000, key,
+                                  level_name(level), msg)
+
+
+def debug_log_clear():
+    _dbg_records.clear()
+
+
+def debug_log_save(filename):
+    '''Write the logged records to a file, and clear them.'''
+    f = open(filename, 'a')
+    for record in _dbg_records:
+        f.write(format_record(record) + '\n')
+    f.close()
+    _dbg_records.clear()
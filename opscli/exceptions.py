@@ -17,3 +17,19 @@
 class EOptionMismatch(Exception):
     '''The words passed in violated the option type's constraints.'''
     pass
+
+
+class EWaitFailed(Exception):
+    '''An OVSDB wait precondition did not hold: the data changed since it
+    was read.'''
+    pass
+
+
+class ESchemaViolation(Exception):
+    '''An OVSDB operation does not match the database schema.'''
+    pass
+
+
+class EPagerQuit(Exception):
+    '''The user quit the pager, so the rest of the output is not wanted.'''
+    pass
@@ -0,0 +1,103 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Run one command line against many OVSDB servers at once.
+
+The command trees and the OVSDB connection are global to a process, so
+every server gets a process of its own, forked from a bounded pool.
+'''
+
+import sys
+import time
+from StringIO import StringIO
+from multiprocessing import Pool
+
+from opscli.output import *
+
+
+# Default number of servers handled at the same time.
+FANOUT_WORKERS = 16
+
+
+def load_targets(filename):
+    '''Read OVSDB server strings from a file, one per line. Blank lines
+    and lines starting with '#' are ignored.'''
+    targets = []
+    f = open(filename)
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        targets.append(line)
+    f.close()
+
+    return targets
+
+
+def run_target(args):
+    '''Run a command line against one server, in a worker process. Returns
+    (server, output, seconds, error), where error is None on success.'''
+    server, line, command_module_paths = args
+    # Imported here, so only worker processes load command modules.
+    from opscli.cli import Opscli
+    output = StringIO()
+    sys.stdout = output
+    error = None
+    start = time.time()
+    try:
+        cli = Opscli(server, command_module_paths=command_module_paths,
+                     interactive=False)
+        cli.process_line(line)
+        if cli.failed:
+            # The error is in the output.
+            error = ''
+    except Exception as e:
+        # The reason may already be in the output.
+        error = str(e)
+    finally:
+        sys.stdout = sys.__stdout__
+
+    return server, output.getvalue(), time.time() - start, error
+
+
+def run_targets(servers, line, command_module_paths, workers=FANOUT_WORKERS):
+    '''Run a command line against all servers, and output the results
+    grouped per server as each one finishes. Returns the number of
+    servers that failed.'''
+    jobs = []
+    for server in servers:
+        jobs.append((server, line, command_module_paths))
+    # A fresh process per server, since a process can only hold one shell.
+    pool = Pool(processes=min(workers, len(jobs)), maxtasksperchild=1)
+    failed = 0
+    try:
+        for server, output, seconds, error in pool.imap_unordered(run_target,
+                                                                  jobs):
+            header = "=== %s (%.2fs)" % (server, seconds)
+            if error is not None:
+                header += " failed"
+                if error:
+                    header += ": %s" % error
+                failed += 1
+            cli_out(header)
+            cli_wrt(output)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return failed
@@ -0,0 +1,183 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Counters and histograms of the shell's work, kept for as long as it runs.
+
+Metrics can be written to a file in the Prometheus text format, for a node
+exporter's textfile collector to pick up.
+'''
+
+import os
+import time
+from collections import OrderedDict
+
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+# Minimum number of seconds between writes of the metrics file.
+EXPORT_INTERVAL = 60
+
+# name -> metric
+_metrics = OrderedDict()
+_export_file = None
+_last_export = 0
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        # label values -> count
+        self.values = {}
+
+    def inc(self, label_values=(), amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        '''Returns the metric in Prometheus text format lines.'''
+        lines = []
+        for label_values in sorted(self.values):
+            labels = format_labels(self.labels, label_values)
+            lines.append("%s%s %s" % (self.name, labels,
+                                      self.values[label_values]))
+        return lines
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts, sum, count, max]
+        self.values = {}
+
+    def observe(self, value, label_values=()):
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = [[0] * len(self.buckets), 0.0, 0, 0.0]
+            self.values[label_values] = entry
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+        entry[3] = max(entry[3], value)
+
+    def samples(self):
+        lines = []
+        for label_values in sorted(self.values):
+            counts, total, count, largest = self.values[label_values]
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append("%s_bucket%s %d" % (self.name, format_labels(
+                             self.labels + ('le', ), label_values +
+                             (repr(bound), )), cumulative))
+            lines.append("%s_bucket%s %d" % (self.name, format_labels(
+                         self.labels + ('le', ), label_values + ('+Inf', )),
+                         count))
+            labels = format_labels(self.labels, label_values)
+            lines.append("%s_sum%s %r" % (self.name, labels, total))
+            lines.append("%s_count%s %d" % (self.name, labels, count))
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append('%s="%s"' % (name, value))
+    return "{%s}" % ','.join(pairs)
+
+
+def counter(name, help_text, labels=()):
+    '''Returns the counter called name, creating it if needed.'''
+    if name not in _metrics:
+        _metrics[name] = Counter(name, help_text, labels)
+    return _metrics[name]
+
+
+def histogram(name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+    '''Returns the histogram called name, creating it if needed.'''
+    if name not in _metrics:
+        _metrics[name] = Histogram(name, help_text, labels, buckets)
+    return _metrics[name]
+
+
+def all_metrics():
+    return _metrics.values()
+
+
+def prometheus_text():
+    lines = []
+    for metric in _metrics.values():
+        lines.append("# HELP %s %s" % (metric.name, metric.help_text))
+        lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def export_to(filename):
+    '''Write the metrics to filename every EXPORT_INTERVAL seconds, as
+    commands are run, or never if filename is None.'''
+    global _export_file, _last_export
+    _export_file = filename
+    _last_export = 0
+
+
+def export(force=True):
+    '''Write the metrics file, if one was set.'''
+    global _last_export
+    if _export_file is None:
+        return
+    now = time.time()
+    if not force and now - _last_export < EXPORT_INTERVAL:
+        return
+    _last_export = now
+    # Replace the file in one go, so it is never read half written.
+    tmpfile = "%s.%d" % (_export_file, os.getpid())
+    f = open(tmpfile, 'w')
+    f.write(prometheus_text())
+    f.close()
+    os.rename(tmpfile, _export_file)
+
+
+ovsdb_connections = counter('opscli_ovsdb_connections_total',
+                            'OVSDB connections opened')
+ovsdb_rpcs = counter('opscli_ovsdb_rpcs_total',
+                     'OVSDB requests sent, per table operated on',
+                     ('method', 'table'))
+ovsdb_bytes_sent = counter('opscli_ovsdb_sent_bytes_total',
+                           'Bytes sent to OVSDB')
+ovsdb_bytes_received = counter('opscli_ovsdb_received_bytes_total',
+                               'Bytes received from OVSDB')
+ovsdb_cache_hits = counter('opscli_ovsdb_cache_hits_total',
+                           'Reads answered without a request', ('cache', ))
+ovsdb_cache_misses = counter('opscli_ovsdb_cache_misses_total',
+                             'Reads not in the select cache', ('cache', ))
+command_seconds = histogram('opscli_command_seconds',
+                            'Time taken by commands', ('command', ))
+parse_failures = counter('opscli_parse_failures_total',
+                         'Command lines that failed to parse')
@@ -13,9 +13,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
 import sys
+import tty
+import time
+import fcntl
+import struct
+import termios
 from collections import OrderedDict as OD
 
+from opscli.exceptions import EPagerQuit
+
 CLI_MSG_MOTD = 'OpenSwitch shell'
 PROMPT_CHAR = '# '
 
@@ -28,6 +36,20 @@ CLI_ERR_NOMATCH = '% There is no matched command.'
 CLI_ERR_AMBIGUOUS = '% Ambiguous command.'
 CLI_ERR_NOHELP_UNK = '% No help available: unknown command.'
 CLI_ERR_SUPERFLUOUS = '% Superfluous option.'
+CLI_ERR_CONFIG_LINE = "%% Failed on '%s': %s"
+CLI_ERR_REPLACE_LINE = "%% Can't change '%s' with configure replace."
+CLI_ERR_NOCANDIDATE = '% No candidate configuration.'
+CLI_ERR_CANDIDATE_PENDING = '% Commit or abort the candidate first.'
+
+PAGER_PROMPT = '--More--'
+PAGER_NOT_FOUND = '% Pattern not found.'
+
+_paging = True
+# The pager of the command being run, if its output is paged.
+_pager = None
+_pager_depth = 0
+# Seconds spent waiting at the pager prompt, in all.
+_prompt_seconds = 0.0
 
 _keymaps = {
     'system': OD([
@@ -92,15 +114,31 @@ _keymaps = {
 
 
 def cli_out(msg=''):
-    print msg
+    if _pager is not None:
+        _pager.write("%s\n" % msg)
+    else:
+        print msg
 
 
 def cli_wrt(msg):
     '''cli_out() without added linefeed.'''
+    if _pager is not None:
+        _pager.write(msg)
+        return
     sys.stdout.write(msg)
     sys.stdout.flush()
 
 
+class Cli_stream:
+    '''A file-like object writing through cli_wrt(), and so the pager, for
+    code that writes to a stream.'''
+    def write(self, text):
+        cli_wrt(text)
+
+    def flush(self):
+        pass
+
+
 def cli_warn(msg):
     cli_out('warning: ' + msg)
 
@@ -109,6 +147,182 @@ def cli_err(msg):
     cli_out(msg)
 
 
+def terminal_size():
+    '''Returns the (rows, columns) of the terminal, or None if the output
+    doesn't go to one.'''
+    if not sys.stdout.isatty():
+        return None
+    try:
+        size = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, '\0' * 8)
+    except IOError:
+        return None
+    rows, columns = struct.unpack('hhhh', size)[:2]
+    if rows < 2 or columns < 1:
+        return None
+    return rows, columns
+
+
+def read_key():
+    '''Wait for a single key press.'''
+    fd = sys.stdin.fileno()
+    old = termios.tcgetattr(fd)
+    try:
+        # Unlike raw mode, this leaves ctrl-c working.
+        tty.setcbreak(fd)
+        return os.read(fd, 1)
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old)
+
+
+class Pager:
+    '''
+    Shows output a page at a time. Lines are collected until the page is
+    full, written in one go, and then the pager waits for a key:
+
+        space    next page
+        return   next line
+        /        search forward for a string, and show the page from there
+        n        search again
+        q        quit
+
+    While it waits, whatever is producing the output waits too. Quitting
+    raises EPagerQuit, which ends the command where it is: output that was
+    not produced yet never is.
+    '''
+    def __init__(self, rows, columns):
+        # The last row is for the prompt.
+        self.page_rows = rows - 1
+        self.columns = columns
+        # Rows that can be shown before prompting.
+        self.rows_left = self.page_rows
+        self.lines = []
+        self.partial = ''
+        self.search = None
+        self.last_search = None
+        self.quit = False
+
+    def write(self, text):
+        if self.quit:
+            raise EPagerQuit
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.add_line(line)
+
+    def add_line(self, line):
+        if self.search is not None:
+            if self.search not in line:
+                # Skipped, but still produced: searching can't stop early.
+                return
+            self.search = None
+        self.lines.append(line + '\n')
+        # Long lines wrap over several rows.
+        self.rows_left -= max(1, (len(line) + self.columns - 1) /
+                              self.columns)
+        if self.rows_left <= 0:
+            self.flush()
+            self.prompt()
+
+    def flush(self):
+        if self.lines:
+            sys.stdout.write(''.join(self.lines))
+            sys.stdout.flush()
+            self.lines = []
+
+    def prompt(self):
+        global _prompt_seconds
+        start = time.time()
+        try:
+            self.wait_key()
+        finally:
+            _prompt_seconds += time.time() - start
+
+    def wait_key(self):
+        sys.stdout.write(PAGER_PROMPT)
+        sys.stdout.flush()
+        while True:
+            key = read_key()
+            if key in ' \r\n/nqQ':
+                break
+        # Erase the prompt.
+        sys.stdout.write("\r%s\r" % (' ' * len(PAGER_PROMPT)))
+        if key == ' ':
+            self.rows_left = self.page_rows
+        elif key in '\r\n':
+            self.rows_left = 1
+        elif key == '/':
+            sys.stdout.write('/')
+            sys.stdout.flush()
+            pattern = sys.stdin.readline().rstrip('\n')
+            if pattern:
+                self.last_search = pattern
+            self.find()
+        elif key == 'n':
+            self.find()
+        else:
+            self.quit = True
+            raise EPagerQuit
+
+    def find(self):
+        self.search = self.last_search
+        self.rows_left = self.page_rows
+
+    def end(self):
+        '''Show what is left of the output.'''
+        if self.quit:
+            return
+        # Less than a page is left, so there is no need to prompt.
+        if self.partial and (self.search is None or
+                             self.search in self.partial):
+            self.lines.append(self.partial + '\n')
+            self.search = None
+        self.flush()
+        if self.search is not None:
+            cli_out(PAGER_NOT_FOUND)
+
+
+def prompt_seconds():
+    '''Returns the seconds spent waiting at the pager prompt so far. Time
+    taken by a command less the difference in this over the same period
+    is the time the command itself took.'''
+    return _prompt_seconds
+
+
+def paging(enable):
+    '''Page the output of commands run from a terminal.'''
+    global _paging
+    _paging = enable
+
+
+def paging_enabled():
+    return _paging
+
+
+def pager_start():
+    '''Page all output until pager_end(), if paging is enabled and the
+    output goes to a terminal. Commands run by other commands share the
+    pager.'''
+    global _pager, _pager_depth
+    if _pager_depth == 0:
+        size = terminal_size()
+        if not _paging or size is None or not sys.stdin.isatty():
+            return
+        _pager = Pager(*size)
+    _pager_depth += 1
+
+
+def pager_end():
+    global _pager, _pager_depth
+    if _pager is None:
+        return
+    _pager_depth -= 1
+    if _pager_depth > 0:
+        return
+    pager = _pager
+    _pager = None
+    pager.end()
+
+
 def out_kv(keymap_name, data):
     '''
     Output key/value pairs, with keys substituted by the value from the
@@ -155,13 +369,14 @@ def out_table(data, title=None, indent=0):
     if not data:
         return
     if title:
-        len_row = title
+        rows = [title] + list(data)
     else:
-        len_row = data[0]
-    maxlen = [0] * len(len_row)
-    for f in range(len(len_row)):
-        if len(len_row[f]) > maxlen[f]:
-            maxlen[f] = len(len_row[f])
+        rows = data
+    maxlen = [0] * len(rows[0])
+    for row in rows:
+        for f in range(len(row)):
+            if len(row[f]) > maxlen[f]:
+                maxlen[f] = len(row[f])
     fmt = ' ' * indent
     for l in maxlen:
         fmt += "%%-%ds   " % l
@@ -16,18 +16,62 @@
 import socket
 import json
 import select
+import re
+import time
+import random
+from copy import deepcopy
+from collections import OrderedDict
 
 import opscli.debug
+import opscli.metrics as metrics
+import opscli.schema
+import opscli.transcript
+from opscli.exceptions import EWaitFailed, ESchemaViolation
 
 
 DEFAULT_DB = 'OpenSwitch'
 OVSDB_TIMEOUT_MS = 1000
+# Number of times an atomic read-modify-write is retried before giving up.
+RMW_RETRIES = 5
+# Before retrying, wait a random time up to this, doubled on every retry
+# so that clients changing the same map don't keep colliding.
+RMW_BACKOFF_MS = 10
+RMW_BACKOFF_MAX_MS = 1000
+# Check operations against the database schema before sending them.
+VALIDATE_SCHEMA = True
+RECV_SIZE = 4096
+# Above this many unresolved references to a table, fetching the whole
+# table is cheaper than selecting the rows one by one.
+RESOLVE_BATCH = 256
+# Maximum number of replies kept in the select cache.
+CACHE_SIZE = 256
+# Selects on a table that differ only in their condition values are
+# reported as N+1 selects when a command makes this many of them.
+N_PLUS_ONE_MIN = 5
+
+# Start of the row array in a select reply.
+ROWS_START = re.compile(r'"rows"\s*:\s*\[')
+# Placeholders in the encoded form of a prepared select.
+PARAM_MARKER = '__opscli_param_%s__'
+PARAM_MARKER_RE = re.compile(r'"__opscli_param_(\w+)__"')
+# Name of the placeholder for the request id.
+PARAM_ID = '_id'
 
 _ovsdb = None
+_transaction = None
+# Replies to reads done in the current query scope, keyed by request.
+_query_scope = None
+_query_scope_depth = 0
+# Requests sent while timing a command.
+_query_log = None
+# Reads done and columns used while analysing a command.
+_analysis_enabled = False
+_analysis = None
+_analysis_depth = 0
 
 
-def dbg(msg):
-    opscli.debug.logline('ovsdb', msg)
+def dbg(msg, *args):
+    opscli.debug.logline('ovsdb', msg, *args)
 
 
 class Ovsdb:
@@ -36,8 +80,14 @@ class Ovsdb:
         _ovsdb = self
         self.server = server
         self.seq = 0
+        # database -> (Schema, whether it was fetched from this server)
+        self.schemas = {}
 
     def connect(self):
+        self.socket = self.open_socket()
+
+    def open_socket(self):
+        '''Returns a new connection to the server.'''
         parts = self.server.split(':')
         if len(parts) < 2:
             raise Exception("Invalid server")
@@ -46,28 +96,73 @@ class Ovsdb:
                 raise Exception("Invalid server")
             ipv4addr, port = parts[1:]
             address = (ipv4addr, int(port))
-            dbg("Connecting to %s port %d" % address)
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            dbg("Connecting to %s port %d", *address)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         elif parts[0] == 'unix':
             if len(parts) != 2:
                 raise Exception("Invalid server")
             address = parts[1]
-            dbg("Connecting to %s" % address)
-            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            dbg("Connecting to %s", address)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         else:
             # TODO: ssl connection method
             raise Exception("unsupported connection method")
 
-        self.socket.connect(address)
+        start = time.time()
+        sock.connect(address)
+        if _query_log is not None:
+            _query_log.wait += time.time() - start
+        metrics.ovsdb_connections.inc()
         dbg("Connected.")
 
+        return opscli.transcript.wrap(sock)
+
     def close(self):
         self.socket.close()
         dbg("Closed connection.")
 
-    def send(self, msg):
-        dbg("Sending %s" % msg)
-        self.socket.send(json.dumps(msg))
+    def send(self, msg, sock=None):
+        data = json.dumps(msg)
+        tables = []
+        if msg['method'] == 'transact':
+            for operation in msg['params'][1:]:
+                if 'table' in operation and operation['table'] not in tables:
+                    tables.append(operation['table'])
+        self.send_raw(data, msg['method'], tables, sock)
+
+    def send_raw(self, data, method='transact', tables=(), sock=None):
+        '''Send an already encoded message, operating on tables, on sock or
+        else the current connection.'''
+        if sock is None:
+            sock = self.socket
+        dbg("Sending %s", data)
+        if _query_log is not None:
+            _query_log.requests.append(data)
+        for table in tables or ('', ):
+            metrics.ovsdb_rpcs.inc((method, table))
+        metrics.ovsdb_bytes_sent.inc(amount=len(data))
+        sock.send(data)
+
+    def receive_chunk(self, poller, sock=None):
+        '''Returns the next chunk of data, or None on timeout.'''
+        if sock is None:
+            sock = self.socket
+        start = time.time()
+        fdlist = poller.poll(OVSDB_TIMEOUT_MS)
+        if not fdlist:
+            if _query_log is not None:
+                _query_log.wait += time.time() - start
+            return None
+        if fdlist[0][1] & select.POLLERR:
+            raise Exception("poll error")
+        chunk = sock.recv(RECV_SIZE)
+        if _query_log is not None:
+            _query_log.wait += time.time() - start
+        metrics.ovsdb_bytes_received.inc(amount=len(chunk))
+        dbg("Received %d bytes: %s", len(chunk), chunk)
+        if len(chunk) == 0:
+            raise Exception
+        return chunk
 
     def receive(self):
         results = {}
@@ -75,17 +170,10 @@ class Ovsdb:
         p.register(self.socket, select.POLLIN)
         data = ''
         while True:
-            fdlist = p.poll(OVSDB_TIMEOUT_MS)
-            if not fdlist:
+            chunk = self.receive_chunk(p)
+            if chunk is None:
                 # Timeout.
                 break
-            if fdlist[0][1] & select.POLLERR:
-                raise Exception("poll error")
-            chunk = self.socket.recv(4096)
-            dbg("Received %d bytes." % len(chunk))
-            dbg(chunk)
-            if len(chunk) == 0:
-                raise Exception
             data += chunk
             try:
                 results = json.loads(data)
@@ -114,9 +202,17 @@ class Ovsdb:
         }
         return insert
 
+    def _delete(self, table, conditions=[]):
+        delete = {
+            "op": "delete",
+            "table": table,
+            "where": conditions,
+        }
+        return delete
+
     def _update(self, table, row, conditions=[]):
         update = {
-            "op": "insert",
+            "op": "update",
             "table": table,
             "where": conditions,
             "row": row,
@@ -132,15 +228,94 @@ class Ovsdb:
         }
         return mutate
 
+    def _wait(self, table, columns, rows, conditions=[]):
+        wait = {
+            "op": "wait",
+            "timeout": 0,
+            "table": table,
+            "where": conditions,
+            "columns": columns,
+            "until": "==",
+            "rows": rows,
+        }
+        return wait
+
     def _transact(self, database, seq, operations):
+        if not isinstance(operations, list):
+            operations = [operations]
         transact = {
             "method": "transact",
-            "params": [database, operations],
+            "params": [database] + operations,
             "id": seq
         }
         return transact
 
+    def get_schema(self, database=DEFAULT_DB):
+        '''Fetch the schema from the server, and cache it on disk.'''
+        self.seq += 1
+        self.send({
+            "method": "get_schema",
+            "params": [database],
+            "id": self.seq,
+        })
+        while True:
+            response = self.receive()
+            if response.get('id') == self.seq:
+                break
+        if response['error'] is not None:
+            raise Exception(response['error'])
+        opscli.schema.save_cached(self.server, database, response['result'])
+        schema = opscli.schema.Schema(response['result'])
+        self.schemas[database] = (schema, True)
+
+        return schema
+
+    def schema(self, database=DEFAULT_DB):
+        '''Returns the schema for database, from memory or the disk cache
+        if possible. Must be called while connected.'''
+        if database not in self.schemas:
+            cached = opscli.schema.load_cached(self.server, database)
+            if cached is not None:
+                self.schemas[database] = (opscli.schema.Schema(cached), False)
+            else:
+                self.get_schema(database)
+
+        return self.schemas[database][0]
+
+    def validate(self, operations, database=DEFAULT_DB):
+        '''Check operations against the schema before they are sent. A
+        schema from the disk cache may be stale, so it is only trusted to
+        reject an operation after a fresh copy confirms it.'''
+        if not VALIDATE_SCHEMA:
+            return
+        if not isinstance(operations, list):
+            operations = [operations]
+        try:
+            schema = self.schema(database)
+            for operation in operations:
+                schema.check_operation(operation)
+        except ESchemaViolation:
+            if self.schemas[database][1]:
+                raise
+            dbg("Cached schema rejected operation, refreshing.")
+            schema = self.get_schema(database)
+            for operation in operations:
+                schema.check_operation(operation)
+
+    def server_rejected(self, database):
+        '''The server rejected a request the schema accepted. A schema from
+        the disk cache may be for an older version of the server, so it is
+        replaced with the server's own.'''
+        if not VALIDATE_SCHEMA or database not in self.schemas:
+            return
+        if not self.schemas[database][1]:
+            dbg("Server rejected request, refreshing cached schema.")
+            self.get_schema(database)
+
+    # Takes a single operation, or a list of operations to be executed
+    # atomically. Returns the result, or a list of results respectively.
     def transact(self, transaction, database=DEFAULT_DB):
+        self.validate(transaction, database)
         self.seq += 1
         tmp = self._transact(database, self.seq, transaction)
         self.send(tmp)
@@ -149,92 +324,1413 @@ class Ovsdb:
             if response.get('id') == self.seq:
                 break
         if response['error'] is not None:
+            self.server_rejected(database)
             raise Exception(response['error'])
-        elif 'error' in response['result'][0]:
-            raise Exception(response['result'][0])
+        for result in response['result']:
+            if result is None or 'error' not in result:
+                continue
+            if result['error'] == 'timed out':
+                # A wait operation with zero timeout failed.
+                raise EWaitFailed(result)
+            self.server_rejected(database)
+            raise Exception(result)
+        if isinstance(transaction, list):
+            return response['result']
         return response['result'][0]
 
     def query(self, table, columns=None, conditions=[], database=DEFAULT_DB):
-        self.seq += 1
         select = self._select(table, columns, conditions)
+        self.validate(select, database)
+        self.seq += 1
         transact = self._transact(database, self.seq, select)
         self.send(transact)
+        return self.select_reply(database)
+
+    def query_prepared(self, prepared, params):
+        '''Like query(), for a Prepared_select with its parameters. The
+        select is checked against the schema the first time, and the
+        parameters on every call.'''
+        if VALIDATE_SCHEMA:
+            if prepared.param_types is None:
+                select = self._select(prepared.table, prepared.columns,
+                                      prepared.bind(params))
+                self.validate(select, prepared.database)
+                prepared.resolve(self.schema(prepared.database))
+            prepared.check_params(params)
+        self.seq += 1
+        self.send_raw(prepared.encode(self.seq, params),
+                      tables=(prepared.table, ))
+        return self.select_reply(prepared.database)
+
+    def select_reply(self, database=DEFAULT_DB):
+        '''Wait for the reply to the last select sent, and return its
+        rows.'''
         while True:
             response = self.receive()
             if response.get('id') == self.seq:
                 break
         if response['error'] is not None:
+            self.server_rejected(database)
             raise Exception(response['error'])
         elif 'error' in response['result'][0]:
+            self.server_rejected(database)
             raise Exception(response['result'][0])
         return response['result'][0]['rows']
 
+    def query_iter(self, table, columns=None, conditions=[],
+                   database=DEFAULT_DB):
+        '''Like query(), but yields rows as soon as each one has been
+        received, without buffering the whole reply.
 
-def get(table, columns=None, conditions=[], database=DEFAULT_DB):
+        The reply is read from a connection of its own, so the caller can
+        make other requests while it works through the rows.'''
+        select = self._select(table, columns, conditions)
+        self.validate(select, database)
+        self.seq += 1
+        seq = self.seq
+        sock = self.open_socket()
+        try:
+            for row in self.receive_rows(sock, table, database, seq,
+                                         select):
+                yield row
+        finally:
+            sock.close()
+            dbg("Closed streaming connection.")
+
+    def receive_rows(self, sock, table, database, seq, select):
+        self.send(self._transact(database, seq, select), sock)
+        poller = select_poll(sock)
+        decoder = json.JSONDecoder()
+
+        # Read up to the start of the row array.
+        data = ''
+        while True:
+            chunk = self.receive_chunk(poller, sock)
+            if chunk is None:
+                raise Exception("timeout waiting for %s" % table)
+            data += chunk
+            match = ROWS_START.search(data)
+            if match:
+                depth = nesting_depth(data[:match.end()])
+                pos = match.end()
+                break
+            try:
+                response = json.loads(data)
+            except ValueError:
+                # Incomplete.
+                continue
+            # A complete message without rows: an error, or not the
+            # reply to this query.
+            if response.get('id') == seq:
+                if response.get('error') is not None:
+                    raise Exception(response['error'])
+                raise Exception(response['result'][0])
+            data = ''
+
+        # Decode one row at a time, keeping only undecoded data around.
+        while True:
+            while pos < len(data) and data[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(data) and data[pos] == ']':
+                pos += 1
+                depth -= 1
+                break
+            try:
+                row, pos = decoder.raw_decode(data, pos)
+            except ValueError:
+                # Incomplete row.
+                chunk = self.receive_chunk(poller, sock)
+                if chunk is None:
+                    raise Exception("timeout waiting for %s" % table)
+                data = data[pos:] + chunk
+                pos = 0
+                continue
+            yield row
+
+        # Consume the rest of the reply.
+        data = data[pos:]
+        while True:
+            depth = nesting_depth(data, depth)
+            if depth == 0:
+                break
+            data = self.receive_chunk(poller, sock)
+            if data is None:
+                raise Exception("timeout waiting for %s" % table)
+
+
+def select_poll(sock):
+    poller = select.poll()
+    poller.register(sock, select.POLLIN)
+    return poller
+
+
+def nesting_depth(text, depth=0):
+    '''Returns the JSON array/object nesting depth at the end of text, given
+    the depth at its start. Text must not start inside a string.'''
+    in_string = escaped = False
+    for c in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == '[' or c == '{':
+            depth += 1
+        elif c == ']' or c == '}':
+            depth -= 1
+
+    return depth
+
+
+class Transaction:
+    '''
+    Write operations queued up to be sent as a single OVSDB transaction.
+
+    Reads made while the transaction is open see its writes: the queued
+    inserts, updates, mutations and deletes are applied to the rows read.
+    Rows read are also remembered, so the transaction can be made
+    conditional on the map columns it writes being unchanged since.
+    '''
+    def __init__(self):
+        self.operations = []
+        self.reads = []
+        # (table, column, conditions) of every map key set or deleted.
+        self.map_edits = []
+        self.inserts = 0
+
+    def add_read(self, table, conditions, rows):
+        self.reads.append((table, conditions, deepcopy(rows)))
+
+    def add_operation(self, operation):
+        if operation['op'] == 'insert' and 'uuid-name' not in operation:
+            # Until it is committed, reads refer to the row by this name.
+            self.inserts += 1
+            operation['uuid-name'] = "row%d" % self.inserts
+        self.operations.append(operation)
+
+    def map_edit(self, table, column, conditions):
+        if (table, column, conditions) not in self.map_edits:
+            self.map_edits.append((table, column, conditions))
+
+    def table_operations(self, table):
+        operations = []
+        for operation in self.operations:
+            if operation['table'] == table:
+                operations.append(operation)
+        return operations
+
+    def query(self, table, columns, conditions):
+        '''Returns the columns and conditions to select for a read of
+        table. If writes to the table are queued, the whole table is read,
+        with the columns needed to tell which rows the writes and the read
+        itself apply to.'''
+        operations = self.table_operations(table)
+        if not operations:
+            return columns, conditions
+        if columns is not None:
+            columns = list(columns)
+            needed = list(conditions)
+            for operation in operations:
+                needed.extend(operation.get('where', []))
+            for condition in needed:
+                if condition[0] not in columns:
+                    columns.append(condition[0])
+        return columns, []
+
+    def overlay(self, table, rows, columns, conditions, database):
+        '''Returns the rows of table that meet conditions once the queued
+        writes are applied to rows, with columns. The rows passed in are
+        left untouched.'''
+        operations = self.table_operations(table)
+        if not operations:
+            return rows
+        results = []
+        for row in rows:
+            results.append(dict(row))
+        for operation in operations:
+            op = operation['op']
+            if op == 'insert':
+                results.append(inserted_row(table, operation, columns,
+                                            database))
+                continue
+            matched = []
+            for row in results:
+                if row_matches(row, operation['where']):
+                    matched.append(row)
+            if op == 'delete':
+                results = [row for row in results if row not in matched]
+            elif op == 'update':
+                for row in matched:
+                    for column, value in operation['row'].items():
+                        if column in row:
+                            row[column] = value
+            elif op == 'mutate':
+                for row in matched:
+                    for column, mutator, arg in operation['mutations']:
+                        if column in row:
+                            row[column] = mutate_value(row[column], mutator,
+                                                       arg)
+        rows = []
+        for row in results:
+            if row_matches(row, conditions):
+                rows.append(row)
+
+        return rows
+
+    def wait_operations(self):
+        '''Preconditions: every map column written in this transaction must
+        still hold the value it had when it was read.'''
+        waits = []
+        for table, column, conditions in self.map_edits:
+            for read_table, read_conditions, rows in self.reads:
+                if read_table != table:
+                    continue
+                # A read with the same conditions saw the rows the edit
+                # applies to, as does a read of the whole table.
+                if read_conditions and read_conditions != conditions:
+                    continue
+                if rows and column not in rows[0]:
+                    continue
+                if rows and read_conditions != conditions:
+                    missing = False
+                    for condition in conditions:
+                        if condition[0] not in rows[0]:
+                            missing = True
+                    if missing:
+                        # Can't tell which rows the edit applies to.
+                        continue
+                wait_rows = []
+                for row in rows:
+                    if row_matches(row, conditions):
+                        wait_rows.append({column: row[column]})
+                waits.append(_ovsdb._wait(table, [column], wait_rows,
+                                          conditions))
+                break
+
+        return waits
+
+
+def is_set(value, tag='set'):
+    return isinstance(value, list) and len(value) == 2 and value[0] == tag
+
+
+def hashable(atom):
+    if isinstance(atom, list):
+        return tuple(atom)
+    return atom
+
+
+def as_set(value):
+    '''Returns a value in wire format as a frozenset of atoms, or of (key,
+    value) pairs for a map. A single atom is a set of one.'''
+    if is_set(value, 'map'):
+        return frozenset((hashable(k), hashable(v)) for k, v in value[1])
+    if is_set(value, 'set'):
+        return frozenset(hashable(atom) for atom in value[1])
+    return frozenset([hashable(value)])
+
+
+def from_set(atoms, is_map):
+    '''The inverse of as_set(), in the shortest wire format.'''
+    def wire(atom):
+        if isinstance(atom, tuple):
+            return list(atom)
+        return atom
+    if is_map:
+        return ['map', [[wire(k), wire(v)] for k, v in sorted(atoms)]]
+    if len(atoms) == 1:
+        return wire(list(atoms)[0])
+    return ['set', [wire(atom) for atom in sorted(atoms)]]
+
+
+def mutate_value(value, mutator, arg):
+    '''Returns a value in wire format with an OVSDB mutation applied.'''
+    if mutator == 'insert' or mutator == 'delete':
+        is_map = is_set(value, 'map')
+        current = as_set(value)
+        if mutator == 'insert' and is_map:
+            keys = set(k for k, v in current)
+            current = current | frozenset((k, v) for k, v in as_set(arg)
+                                          if k not in keys)
+        elif mutator == 'insert':
+            current = current | as_set(arg)
+        elif is_map and not is_set(arg, 'map'):
+            # Deleting keys, whatever their values.
+            keys = as_set(arg)
+            current = frozenset((k, v) for k, v in current if k not in keys)
+        else:
+            current = current - as_set(arg)
+        return from_set(current, is_map)
+    return MUTATORS[mutator](value, arg)
+
+
+# OVSDB mutators on numbers.
+MUTATORS = {
+    '+=': lambda a, b: a + b,
+    '-=': lambda a, b: a - b,
+    '*=': lambda a, b: a * b,
+    '/=': lambda a, b: a / b,
+    '%=': lambda a, b: a % b,
+}
+
+# OVSDB condition functions, on values in wire format.
+CONDITION_FUNCTIONS = {
+    '==': lambda a, b: as_set(a) == as_set(b),
+    'includes': lambda a, b: as_set(b) <= as_set(a),
+    '!=': lambda a, b: as_set(a) != as_set(b),
+    'excludes': lambda a, b: not as_set(a) & as_set(b),
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def row_matches(row, conditions):
+    '''Returns whether a row in wire format meets all conditions. A row
+    without a column in the conditions is taken to match.'''
+    for column, function, value in conditions:
+        if column not in row:
+            continue
+        if not CONDITION_FUNCTIONS[function](row[column], value):
+            return False
+    return True
+
+
+def inserted_row(table, operation, columns, database):
+    '''Returns the row a queued insert will add, as a read of columns
+    would return it.'''
+    schema = loaded_schema(database)
+    if columns is None:
+        columns = ['_uuid', '_version'] + list(schema.tables[table]['columns'])
+    row = {}
+    for column in columns:
+        if column == '_uuid':
+            row[column] = ['named-uuid', operation['uuid-name']]
+        elif column in operation['row']:
+            row[column] = operation['row'][column]
+        else:
+            row[column] = opscli.schema.default_value(schema.get_column(
+                                                      table, column))
+
+    return row
+
+
+def loaded_schema(database=DEFAULT_DB):
+    '''Returns the schema for database, fetching it if need be.'''
+    if database not in _ovsdb.schemas:
+        _ovsdb.connect()
+        try:
+            _ovsdb.schema(database)
+        finally:
+            _ovsdb.close()
+    return _ovsdb.schemas[database][0]
+
+
+def transaction_start():
+    '''Queue up all writes until transaction_commit() is called.'''
+    global _transaction
+    if _transaction is not None:
+        raise Exception("transaction already in progress")
+    _transaction = Transaction()
+
+
+def transaction_active():
+    return _transaction is not None
+
+
+def transaction_pending():
+    '''Returns whether writes are queued in the open transaction.'''
+    return _transaction is not None and len(_transaction.operations) > 0
+
+
+def transaction_commit(database=DEFAULT_DB):
+    '''Send all queued writes as one transaction. Returns the number of
+    write operations sent. If sending fails, the writes stay queued.'''
+    global _transaction
+    tr = _transaction
+    if tr is None:
+        raise Exception("no transaction in progress")
+    if tr.operations:
+        invalidate_reads(tr.operations)
+        _ovsdb.connect()
+        try:
+            _ovsdb.transact(tr.wait_operations() + tr.operations,
+                            database=database)
+        finally:
+            _ovsdb.close()
+    else:
+        dbg("Nothing to commit.")
+    _transaction = None
+
+    return len(tr.operations)
+
+
+def transaction_abort():
+    '''Discard all queued writes.'''
+    global _transaction
+    _transaction = None
+
+
+class Select_cache:
+    '''
+    Replies to selects, kept for a per-table time to live. The least
+    recently used reply is dropped when the cache is full. A table with
+    a zero time to live is not cached.
+    '''
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.default_ttl = 0
+        # table -> seconds
+        self.ttls = {}
+        # key -> (expiry time, table, rows), least recently used first.
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ttl(self, table):
+        return self.ttls.get(table, self.default_ttl)
+
+    def lookup(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None or entry[0] < time.time():
+            self.misses += 1
+            metrics.ovsdb_cache_misses.inc(('select', ))
+            dbg("Cache miss (%d hits, %d misses)", self.hits, self.misses)
+            return None
+        # Now the most recently used.
+        self.entries[key] = entry
+        self.hits += 1
+        metrics.ovsdb_cache_hits.inc(('select', ))
+        dbg("Cache hit (%d hits, %d misses)", self.hits, self.misses)
+        return entry[2]
+
+    def store(self, key, table, rows):
+        ttl = self.ttl(table)
+        if ttl <= 0:
+            return
+        self.entries.pop(key, None)
+        self.entries[key] = (time.time() + ttl, table, rows)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, table):
+        for key in list(self.entries):
+            if self.entries[key][1] == table:
+                del self.entries[key]
+
+
+_cache = Select_cache()
+
+
+def cache_configure(default_ttl=None, ttls=None, size=None):
+    '''Set the select cache time to live in seconds, for all tables and
+    per table, and the maximum number of replies kept.'''
+    if default_ttl is not None:
+        _cache.default_ttl = default_ttl
+    if ttls is not None:
+        _cache.ttls.update(ttls)
+    if size is not None:
+        _cache.size = size
+
+
+def cache_stats():
+    '''Returns the number of cache hits, misses and replies cached.'''
+    return _cache.hits, _cache.misses, len(_cache.entries)
+
+
+def invalidate_reads(operations):
+    '''Forget any read replies the write operations may affect.'''
+    if not isinstance(operations, list):
+        operations = [operations]
+    query_scope_invalidate()
+    for operation in operations:
+        _cache.invalidate(operation['table'])
+
+
+def query_scope_start():
+    '''Identical reads are only sent once until query_scope_end(), unless
+    something is written in between. Scopes may be nested.'''
+    global _query_scope, _query_scope_depth
+    if _query_scope_depth == 0:
+        _query_scope = {}
+    _query_scope_depth += 1
+
+
+def query_scope_end():
+    global _query_scope, _query_scope_depth
+    _query_scope_depth -= 1
+    if _query_scope_depth == 0:
+        _query_scope = None
+
+
+def query_scope_invalidate():
+    if _query_scope is not None:
+        _query_scope.clear()
+
+
+class Query_log:
+    '''The requests sent while a command runs, and the time spent waiting
+    on the server.'''
+    def __init__(self):
+        self.requests = []
+        self.wait = 0.0
+
+    def round_trips(self):
+        return len(self.requests)
+
+
+def query_log_start():
+    global _query_log
+    _query_log = Query_log()
+
+
+def query_log_end():
+    '''Stop logging, and return the log.'''
+    global _query_log
+    log = _query_log
+    _query_log = None
+    return log
+
+
+class Analysis_row(dict):
+    '''A row in wire format that notes which of its columns are used.'''
+    __slots__ = ('used', )
+
+    def __init__(self, data, used):
+        dict.__init__(self, data)
+        self.used = used
+
+    def __getitem__(self, column):
+        self.used.add(column)
+        return dict.__getitem__(self, column)
+
+    def get(self, column, default=None):
+        self.used.add(column)
+        return dict.get(self, column, default)
+
+    def items(self):
+        self.used.update(self.keys())
+        return dict.items(self)
+
+    def iteritems(self):
+        self.used.update(self.keys())
+        return dict.iteritems(self)
+
+    def values(self):
+        self.used.update(self.keys())
+        return dict.values(self)
+
+
+class Query_analysis:
+    '''The reads done while a command runs, and the columns used of the
+    rows they returned.'''
+    def __init__(self):
+        # key -> [table, columns, conditions, reads, round trips]
+        self.reads = OrderedDict()
+        # table -> columns received
+        self.fetched = {}
+        # table -> columns used
+        self.used = {}
+        # Tables read without a column list.
+        self.unprojected = set()
+
+    def add_read(self, table, key, columns, conditions, sent, rows):
+        if key not in self.reads:
+            self.reads[key] = [table, columns, conditions, 0, 0]
+        entry = self.reads[key]
+        entry[3] += 1
+        if sent:
+            entry[4] += 1
+        if columns is None:
+            self.unprojected.add(table)
+        self.used.setdefault(table, set())
+        if rows:
+            self.add_columns(table, rows[0].keys())
+
+    def add_columns(self, table, columns):
+        self.fetched.setdefault(table, set()).update(columns)
+
+    def use(self, table, column):
+        self.used.setdefault(table, set()).add(column)
+
+    def track(self, table, rows):
+        '''Returns the rows in wire format, noting their use.'''
+        used = self.used.setdefault(table, set())
+        results = []
+        for row in rows:
+            results.append(Analysis_row(row, used))
+        return results
+
+    def describe(self, entry):
+        table, columns, conditions = entry[:3]
+        if columns is None:
+            text = "%s (all columns)" % table
+        else:
+            text = "%s (%s)" % (table, ', '.join(columns))
+        if conditions:
+            text += " where %s" % json.dumps(conditions)
+        return text
+
+    def report(self):
+        '''Returns lines describing wasted reads, if any.'''
+        lines = []
+        for table in sorted(self.fetched):
+            fetched = self.fetched[table]
+            used = self.used[table] & fetched
+            unused = sorted(fetched - used)
+            if not unused:
+                continue
+            if table in self.unprojected:
+                lines.append("%s: all columns selected, %d of %d used: %s" %
+                             (table, len(used), len(fetched),
+                              ', '.join(sorted(used)) or 'none'))
+            else:
+                lines.append("%s: columns selected but not used: %s" %
+                             (table, ', '.join(unused)))
+        # (table, columns, condition columns and functions) -> reads
+        shapes = OrderedDict()
+        for entry in self.reads.values():
+            table, columns, conditions, reads, sent = entry
+            if reads > 1:
+                lines.append("Repeated %d times, %d sent: %s" % (reads, sent,
+                             self.describe(entry)))
+            if conditions:
+                shape = []
+                for condition in conditions:
+                    shape.append(condition[:2])
+                shape = json.dumps([table, columns, shape])
+                shapes.setdefault(shape, []).append(entry)
+        for entries in shapes.values():
+            if len(entries) < N_PLUS_ONE_MIN:
+                continue
+            by = []
+            for condition in entries[0][2]:
+                by.append(condition[0])
+            lines.append("N+1: %d selects on %s by %s, one per row." % (
+                         len(entries), entries[0][0], ', '.join(by)))
+
+        return lines
+
+
+def analysis_enable(enable):
+    '''Analyse the reads of every command from now on.'''
+    global _analysis_enabled
+    _analysis_enabled = enable
+
+
+def analysis_enabled():
+    return _analysis_enabled
+
+
+def analysis_start():
+    '''Start recording reads and the use of their columns, if analysis is
+    enabled. Commands run by other commands share the analysis.'''
+    global _analysis, _analysis_depth
+    if not _analysis_enabled and _analysis is None:
+        return
+    if _analysis_depth == 0:
+        _analysis = Query_analysis()
+    _analysis_depth += 1
+
+
+def analysis_end():
+    '''Returns the report lines once the outermost command is done.'''
+    global _analysis, _analysis_depth
+    if _analysis is None:
+        return []
+    _analysis_depth -= 1
+    if _analysis_depth > 0:
+        return []
+    analysis = _analysis
+    _analysis = None
+    return analysis.report()
+
+
+def write(tr, database=DEFAULT_DB):
+    '''Send a write operation, or queue it if a transaction is open.'''
+    if _transaction is not None:
+        _transaction.add_operation(tr)
+        return None
+    invalidate_reads(tr)
     _ovsdb.connect()
-    response = _ovsdb.query(table=table, columns=columns,
-                            conditions=conditions, database=database)
+    response = _ovsdb.transact(tr, database=database)
     _ovsdb.close()
 
     return response
 
 
-def get_map(table, column, conditions=[]):
-    data = get(table, [column], conditions=conditions)[0][column][1]
-    results = {}
-    for key, value in data:
-        results[key] = value
+class Uuid(str):
+    '''A UUID reference to a row, as opposed to a string.'''
+    __slots__ = ()
+    # Type in wire format.
+    wire_type = 'uuid'
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, str(self))
+
+    def wire(self):
+        '''Returns the reference in wire format, as used in conditions.'''
+        return [self.wire_type, str(self)]
+
+
+class Named_uuid(Uuid):
+    '''A reference to a row inserted in the open transaction, by the name
+    it has until the transaction is committed.'''
+    __slots__ = ()
+    wire_type = 'named-uuid'
+
+
+def decode(value):
+    '''Convert a value in OVSDB wire format to native types: maps become
+    dicts, sets become frozensets, and UUIDs become Uuid objects.'''
+    if not isinstance(value, list):
+        # Plain atom.
+        return value
+    if value[0] == 'map':
+        results = {}
+        for key, map_value in value[1]:
+            results[decode(key)] = decode(map_value)
+        return results
+    elif value[0] == 'set':
+        items = []
+        for item in value[1]:
+            items.append(decode(item))
+        return frozenset(items)
+    elif value[0] == 'uuid':
+        return Uuid(value[1])
+    elif value[0] == 'named-uuid':
+        return Named_uuid(value[1])
+    raise Exception("unknown OVSDB type '%s'" % value[0])
+
+
+class Column(object):
+    '''Row attribute holding a column value. The value is kept as received
+    until it is first accessed, and only then decoded.'''
+    __slots__ = ('slot',)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, row, cls):
+        if row is None:
+            return self
+        if _analysis is not None:
+            _analysis.use(row.table, self.slot.__name__[5:])
+        value = self.slot.__get__(row, cls)
+        if isinstance(value, list):
+            # Decoded values are never lists.
+            value = decode(value)
+            self.slot.__set__(row, value)
+        return value
+
+
+class Row(object):
+    '''Base class for the per-table row classes made by row_class().'''
+    __slots__ = ()
+    table = None
+    columns = ()
+
+    def __init__(self, data):
+        for column in self.columns:
+            setattr(self, '_raw_' + column, data[column])
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.table)
+
+    def __getitem__(self, column):
+        if column not in self.columns:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def get(self, column, default=None):
+        if column not in self.columns:
+            return default
+        return getattr(self, column)
+
+    def keys(self):
+        return list(self.columns)
+
+
+_row_classes = {}
+
+
+def row_class(table, columns):
+    '''Returns a Row subclass for the table, with a slot for each of the
+    columns. Classes are made once per table and set of columns.'''
+    columns = tuple(sorted(columns))
+    key = (table, columns)
+    if key not in _row_classes:
+        slots = []
+        for column in columns:
+            slots.append('_raw_' + column)
+        attrs = {
+            '__slots__': tuple(slots),
+            'table': table,
+            'columns': columns,
+        }
+        cls = type(str("%s_row" % table), (Row,), attrs)
+        for column in columns:
+            setattr(cls, column, Column(cls.__dict__['_raw_' + column]))
+        _row_classes[key] = cls
+
+    return _row_classes[key]
+
+
+def decode_rows(table, rows):
+    results = []
+    if not rows:
+        return results
+    if _analysis is not None:
+        # Decoding doesn't count as use of the columns, only reading the
+        # Row attributes does.
+        rows = [dict(row) for row in rows]
+    cls = row_class(table, rows[0].keys())
+    for row in rows:
+        results.append(cls(row))
 
     return results
 
 
-def insert(table, row, database=DEFAULT_DB):
-    _ovsdb.connect()
-    tr = _ovsdb._insert(table, row)
-    response = _ovsdb.transact(tr, database=database)
-    _ovsdb.close()
+def references(value):
+    '''Returns a list of the UUIDs in a decoded value.'''
+    refs = []
+    if isinstance(value, Uuid):
+        refs.append(value)
+    elif isinstance(value, frozenset):
+        for item in value:
+            if isinstance(item, Uuid):
+                refs.append(item)
+    elif isinstance(value, dict):
+        for key, map_value in value.items():
+            if isinstance(key, Uuid):
+                refs.append(key)
+            if isinstance(map_value, Uuid):
+                refs.append(map_value)
+
+    return refs
+
+
+class Resolver:
+    '''
+    Resolves UUID references to rows. All references that are not yet known
+    are fetched in a single round trip. Rows are remembered, so a command
+    should use one resolver for all of its lookups.
+    '''
+    def __init__(self, database=DEFAULT_DB):
+        self.database = database
+        # (table, columns) -> {uuid: Row}
+        self.memo = {}
+
+    def table_memo(self, table, columns):
+        if columns is None:
+            key = (table, None)
+        else:
+            columns = list(columns)
+            if '_uuid' not in columns:
+                columns.append('_uuid')
+            key = (table, tuple(sorted(columns)))
+        if key not in self.memo:
+            self.memo[key] = {}
+
+        return columns, self.memo[key]
+
+    def get(self, table, columns=None, conditions=[]):
+        '''Like get_rows(), but the rows are remembered for resolving
+        references to them later.'''
+        columns, memo = self.table_memo(table, columns)
+        rows = get_rows(table, columns, conditions, self.database)
+        for row in rows:
+            memo[row._uuid] = row
+
+        return rows
+
+    def resolve(self, table, uuids, columns=None):
+        '''Returns a dict of uuid to Row for each of the uuids that exists
+        in table.'''
+        columns, memo = self.table_memo(table, columns)
+        missing = set()
+        for uuid in uuids:
+            if uuid not in memo:
+                missing.add(uuid)
+        if missing:
+            self.fetch(table, columns, missing, memo)
+        results = {}
+        for uuid in uuids:
+            if uuid in memo:
+                results[uuid] = memo[uuid]
+
+        return results
+
+    def fetch(self, table, columns, uuids, memo):
+        dbg("Resolving %d references to %s.", len(uuids), table)
+        if len(uuids) > RESOLVE_BATCH or _transaction is not None:
+            rows = get_rows(table, columns, database=self.database)
+        else:
+            # One select per row, all in the same transaction.
+            operations = []
+            for uuid in uuids:
+                conditions = [['_uuid', '==', ['uuid', uuid]]]
+                operations.append(_ovsdb._select(table, columns, conditions))
+            _ovsdb.connect()
+            try:
+                results = _ovsdb.transact(operations, database=self.database)
+            finally:
+                _ovsdb.close()
+            rows = []
+            for result in results:
+                rows.extend(result['rows'])
+            if _analysis is not None:
+                key = json.dumps([self.database, table, columns,
+                                  sorted(uuids)])
+                _analysis.add_read(table, key, columns, [], True, rows)
+            rows = decode_rows(table, rows)
+        for row in rows:
+            memo[row._uuid] = row
+
+    def follow(self, rows, column, table, columns=None):
+        '''Resolve the references in column of all rows to rows in table.
+        Returns a dict of uuid to Row.'''
+        uuids = []
+        for row in rows:
+            uuids.extend(references(getattr(row, column)))
+
+        return self.resolve(table, uuids, columns)
+
+
+def read_cached(table, key):
+    '''Returns the rows for a read identified by key from the query scope
+    or cache, or None if they have to be fetched.'''
+    if _query_scope is not None and key in _query_scope:
+        dbg("Reusing reply for %s", key)
+        metrics.ovsdb_cache_hits.inc(('scope', ))
+        return _query_scope[key]
+    elif _cache.ttl(table) > 0:
+        return _cache.lookup(key)
+    return None
+
+
+def read_done(table, key, response, sent, columns=None, conditions=[]):
+    '''Remember the rows for a read, once they are known.'''
+    if sent:
+        _cache.store(key, table, response)
+    if _query_scope is not None:
+        _query_scope[key] = response
+    if _analysis is not None:
+        _analysis.add_read(table, key, columns, conditions, sent, response)
+
+
+def read(table, key, fetch, columns=None, conditions=[]):
+    '''Returns the rows for a read identified by key, from the query scope
+    or cache if possible, and otherwise by calling fetch(). The columns and
+    conditions are only used for analysis.'''
+    response = read_cached(table, key)
+    sent = False
+    if response is None:
+        _ovsdb.connect()
+        try:
+            response = fetch()
+        finally:
+            _ovsdb.close()
+        sent = True
+    read_done(table, key, response, sent, columns, conditions)
+
+    return response
+
+
+def read_query(table, columns, conditions):
+    '''Returns the columns and conditions to select for a read, and the
+    extra columns among them needed only to apply the open transaction's
+    writes.'''
+    if _transaction is None:
+        return columns, conditions, []
+    query_columns, query_conditions = _transaction.query(table, columns,
+                                                         conditions)
+    extra = []
+    if columns is not None:
+        for column in query_columns:
+            if column not in columns:
+                extra.append(column)
+    return query_columns, query_conditions, extra
+
+
+def read_rows(table, columns, conditions, query_conditions, response, extra,
+              database=DEFAULT_DB):
+    '''Returns the rows read as the caller should see them: with the open
+    transaction's writes applied, and without the extra columns.'''
+    if _transaction is not None:
+        _transaction.add_read(table, query_conditions, response)
+        response = _transaction.overlay(table, response, columns, conditions,
+                                        database)
+        if extra:
+            results = []
+            for row in response:
+                row = dict(row)
+                for column in extra:
+                    del row[column]
+                results.append(row)
+            response = results
+    if _analysis is not None:
+        response = _analysis.track(table, response)
 
     return response
 
 
+def get(table, columns=None, conditions=[], database=DEFAULT_DB):
+    query_columns, query_conditions, extra = read_query(table, columns,
+                                                        conditions)
+
+    def fetch():
+        return _ovsdb.query(table=table, columns=query_columns,
+                            conditions=query_conditions, database=database)
+
+    key = json.dumps([database, table, query_columns, query_conditions])
+    response = read(table, key, fetch, query_columns, query_conditions)
+
+    return read_rows(table, query_columns, conditions, query_conditions,
+                     response, extra, database)
+
+
+def get_batch(reads, database=DEFAULT_DB):
+    '''Like get() for each of a list of (table, columns, conditions). All
+    reads that aren't in the query scope or cache are sent in a single
+    round trip. Returns a list of replies, in the same order.'''
+    keys = []
+    # key -> rows
+    replies = {}
+    # key -> select operation
+    pending = OrderedDict()
+    queries = []
+    for table, columns, conditions in reads:
+        query_columns, query_conditions, extra = read_query(table, columns,
+                                                            conditions)
+        queries.append((query_columns, query_conditions, extra))
+        key = json.dumps([database, table, query_columns, query_conditions])
+        keys.append(key)
+        if key in replies or key in pending:
+            continue
+        response = read_cached(table, key)
+        if response is None:
+            pending[key] = _ovsdb._select(table, query_columns,
+                                          query_conditions)
+        else:
+            replies[key] = response
+    if pending:
+        _ovsdb.connect()
+        try:
+            results = _ovsdb.transact(pending.values(), database=database)
+        finally:
+            _ovsdb.close()
+        for key, result in zip(pending, results):
+            replies[key] = result['rows']
+    results = []
+    for i in range(len(reads)):
+        table, columns, conditions = reads[i]
+        query_columns, query_conditions, extra = queries[i]
+        response = replies[keys[i]]
+        read_done(table, keys[i], response, keys[i] in pending,
+                  query_columns, query_conditions)
+        # Only the first of identical reads was sent.
+        pending.pop(keys[i], None)
+        results.append(read_rows(table, query_columns, conditions,
+                                 query_conditions, response, extra,
+                                 database))
+
+    return results
+
+
+class Param(object):
+    '''Placeholder for a value in the conditions of a Prepared_select.'''
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.name)
+
+
+class Prepared_select:
+    '''
+    A select that is JSON encoded only once, on first use. Each time it is
+    run only the values of its parameters, declared as Param objects in
+    the conditions, are encoded and spliced in. For example:
+
+        by_name = Prepared_select('Interface',
+                                  conditions=[['name', '==', Param('name')]])
+        rows = by_name.get_rows(name='1')
+    '''
+    def __init__(self, table, columns=None, conditions=[],
+                 database=DEFAULT_DB):
+        self.table = table
+        self.columns = columns
+        self.conditions = conditions
+        self.database = database
+        # Alternating literal encoded strings and parameter names.
+        self.chunks = None
+        # The schema the select was checked against, and for each condition
+        # with parameters (where, column type, keys only, value).
+        self.schema = None
+        self.param_types = None
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.table)
+
+    def substitute(self, value, params):
+        if isinstance(value, Param):
+            return params[value.name]
+        elif isinstance(value, list):
+            results = []
+            for item in value:
+                results.append(self.substitute(item, params))
+            return results
+        return value
+
+    def bind(self, params):
+        '''Returns the conditions with the parameters filled in.'''
+        return self.substitute(self.conditions, params)
+
+    def resolve(self, schema):
+        '''Look up the types of the columns the parameters are compared
+        with.'''
+        param_types = []
+        for column, function, value in self.conditions:
+            if not self.param_names(value):
+                continue
+            col_type = opscli.schema.column_type(schema.get_column(
+                                                 self.table, column))
+            param_types.append(("%s:%s" % (self.table, column), col_type,
+                                function in ('includes', 'excludes'),
+                                value))
+        self.schema = schema
+        self.param_types = param_types
+
+    def check_params(self, params):
+        '''Raises ESchemaViolation if a parameter does not fit the type of
+        its column.'''
+        for where, col_type, keys_only, value in self.param_types:
+            self.schema.check_typed(where, col_type,
+                                    self.substitute(value, params), keys_only)
+
+    def encode(self, seq, params):
+        if self.chunks is None:
+            markers = {}
+            for name in self.param_names(self.conditions):
+                markers[name] = PARAM_MARKER % name
+            select = _ovsdb._select(self.table, self.columns,
+                                    self.substitute(self.conditions, markers))
+            message = _ovsdb._transact(self.database, PARAM_MARKER % PARAM_ID,
+                                       select)
+            self.chunks = PARAM_MARKER_RE.split(json.dumps(message))
+        parts = []
+        for i in range(len(self.chunks)):
+            if i % 2 == 0:
+                parts.append(self.chunks[i])
+            elif self.chunks[i] == PARAM_ID:
+                parts.append(str(seq))
+            else:
+                parts.append(json.dumps(params[self.chunks[i]]))
+
+        return ''.join(parts)
+
+    def param_names(self, value):
+        names = []
+        if isinstance(value, Param):
+            names.append(value.name)
+        elif isinstance(value, list):
+            for item in value:
+                names.extend(self.param_names(item))
+        return names
+
+    def get(self, **params):
+        '''Like get(), returning rows in wire format.'''
+        if _transaction is not None:
+            # Reads need the transaction's overlay.
+            return get(self.table, self.columns, self.bind(params),
+                       self.database)
+
+        def fetch():
+            return _ovsdb.query_prepared(self, params)
+
+        values = []
+        for name in sorted(params):
+            values.append(params[name])
+        key = "%s:%s" % (id(self), json.dumps(values))
+        conditions = self.bind(params)
+        response = read(self.table, key, fetch, self.columns, conditions)
+        if _analysis is not None:
+            response = _analysis.track(self.table, response)
+
+        return response
+
+    def get_rows(self, **params):
+        return decode_rows(self.table, self.get(**params))
+
+
+def get_rows(table, columns=None, conditions=[], database=DEFAULT_DB):
+    '''Like get(), but returns Row objects with decoded values.'''
+    rows = get(table, columns=columns, conditions=conditions,
+               database=database)
+    return decode_rows(table, rows)
+
+
+def iter_rows(table, columns=None, conditions=[], database=DEFAULT_DB):
+    '''Yields Row objects as they are received. If the caller stops
+    early, the rest of the reply is never decoded. Other reads can be done
+    while going through the rows.'''
+    if _transaction is not None:
+        # Reads need the transaction's overlay.
+        for row in get_rows(table, columns, conditions, database):
+            yield row
+        return
+    if _analysis is not None:
+        key = json.dumps([database, table, columns, conditions])
+        _analysis.add_read(table, key, columns, conditions, True, ())
+    cls = None
+    for data in _ovsdb.query_iter(table, columns, conditions, database):
+        if cls is None:
+            cls = row_class(table, data.keys())
+            if _analysis is not None:
+                _analysis.add_columns(table, data.keys())
+        yield cls(data)
+
+
+# (table, column) -> Prepared_select, for get_map() without conditions.
+_prepared_maps = {}
+
+
+def get_map(table, column, conditions=[]):
+    if conditions:
+        row = get_rows(table, [column], conditions=conditions)[0]
+    else:
+        if (table, column) not in _prepared_maps:
+            _prepared_maps[(table, column)] = Prepared_select(table, [column])
+        row = _prepared_maps[(table, column)].get_rows()[0]
+    return getattr(row, column)
+
+
+def insert(table, row, database=DEFAULT_DB):
+    tr = _ovsdb._insert(table, row)
+    return write(tr, database=database)
+
+
 def update(table, row, conditions=[], database=DEFAULT_DB):
-    _ovsdb.connect()
     tr = _ovsdb._update(table, row, conditions)
-    response = _ovsdb.transact(tr, database=database)
-    _ovsdb.close()
+    return write(tr, database=database)
 
-    return response
+
+def delete(table, conditions=[], database=DEFAULT_DB):
+    tr = _ovsdb._delete(table, conditions)
+    return write(tr, database=database)
 
 
 def mutate_map(table, mutations, conditions=[]):
-    _ovsdb.connect()
     tr = _ovsdb._mutate(table, mutations, conditions)
-    response = _ovsdb.transact(tr, database=DEFAULT_DB)
-    _ovsdb.close()
-
-    return response
+    return write(tr)
 
 
 def map_set_key(table, column, key, value, conditions=[]):
-    _ovsdb.connect()
     mutations = [
         [column, 'delete', ['set', [key]]],
         [column, 'insert', ['map', [[key, value]]]],
     ]
     tr = _ovsdb._mutate(table, mutations, conditions)
-    response = _ovsdb.transact(tr, database=DEFAULT_DB)
-    _ovsdb.close()
-
-    return response
+    if _transaction is not None:
+        _transaction.map_edit(table, column, conditions)
+    return write(tr)
 
 
 def map_delete_key(table, column, key, conditions=[]):
-    _ovsdb.connect()
     mutations = [
         [column, 'delete', ['set', [key]]],
     ]
     tr = _ovsdb._mutate(table, mutations, conditions)
-    response = _ovsdb.transact(tr, database=DEFAULT_DB)
-    _ovsdb.close()
+    if _transaction is not None:
+        _transaction.map_edit(table, column, conditions)
+    return write(tr)
 
-    return response
+
+def rmw_backoff(attempt):
+    '''Returns the seconds to wait before retry number attempt, counting
+    from 1.'''
+    limit = min(RMW_BACKOFF_MS * 2 ** (attempt - 1), RMW_BACKOFF_MAX_MS)
+    return random.uniform(0, limit) / 1000.0
+
+
+def map_update_key(table, column, key, update_fn, conditions=[],
+                   retries=None):
+    '''
+    Atomically change the value of a map key. update_fn is called with the
+    current value, or None if the key is not set, and returns the new value
+    or None to delete the key.
+
+    The read and the conditional write share one connection. If another
+    client changed the map in between, the write is not done and the whole
+    operation is retried after a random backoff, up to retries times
+    (RMW_RETRIES by default). Returns the new value.
+    '''
+    if retries is None:
+        retries = RMW_RETRIES
+    if _transaction is not None:
+        # Reads and writes are covered by the open transaction.
+        old_value = get_map(table, column, conditions).get(key)
+        value = update_fn(old_value)
+        if value == old_value:
+            pass
+        elif value is None:
+            map_delete_key(table, column, key, conditions)
+        else:
+            map_set_key(table, column, key, value, conditions)
+        return value
+
+    _ovsdb.connect()
+    try:
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(rmw_backoff(attempt))
+            rows = _ovsdb.query(table, [column], conditions)
+            if not rows:
+                raise Exception("no rows in %s" % table)
+            old_value = None
+            for map_key, map_value in rows[0][column][1]:
+                if map_key == key:
+                    old_value = map_value
+                    break
+            value = update_fn(old_value)
+            if value == old_value:
+                # Nothing to write.
+                return value
+            mutations = [[column, 'delete', ['set', [key]]]]
+            if value is not None:
+                mutations.append([column, 'insert', ['map', [[key, value]]]])
+            operations = [
+                _ovsdb._wait(table, [column], rows, conditions),
+                _ovsdb._mutate(table, mutations, conditions),
+            ]
+            invalidate_reads(operations)
+            try:
+                _ovsdb.transact(operations)
+                return value
+            except EWaitFailed:
+                dbg("%s:%s changed during update, retrying.", table,
+                    column)
+        raise Exception("%s:%s is being changed concurrently" % (table,
+                        column))
+    finally:
+        _ovsdb.close()
+
+
+def map_increment_key(table, column, key, conditions=[], retries=None):
+    '''Atomically increment a counter kept as a string in a map.'''
+    def increment(value):
+        if value is None:
+            return '1'
+        return str(int(value) + 1)
+
+    return map_update_key(table, column, key, increment, conditions,
+                          retries)
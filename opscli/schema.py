@@ -0,0 +1,261 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Client-side checking of OVSDB operations against the database schema, so
+bad requests fail before they are sent.
+'''
+
+import os
+import re
+import json
+
+import opscli.debug
+from opscli.exceptions import ESchemaViolation
+
+
+SCHEMA_CACHE_DIR = '~/.opscli_schema'
+# The schema each server last sent, as "server database" -> schema id.
+SCHEMA_INDEX = 'servers.json'
+
+# Columns every table has, but which are not in the schema.
+IMPLICIT_COLUMNS = {
+    '_uuid': {'key': 'uuid'},
+    '_version': {'key': 'uuid'},
+}
+
+
+def dbg(msg, *args):
+    opscli.debug.logline('ovsdb', msg, *args)
+
+
+def cache_path(filename):
+    return os.path.join(os.path.expanduser(SCHEMA_CACHE_DIR), filename)
+
+
+def schema_id(database, schema):
+    '''Identifies a schema by its version and checksum, as a string that
+    can be used in a filename.'''
+    name = "%s-%s-%s" % (database, schema.get('version', 'unknown'),
+                         schema.get('cksum', 'none'))
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+def load_json(path):
+    try:
+        f = open(path)
+        data = json.load(f)
+        f.close()
+    except Exception as e:
+        if os.path.exists(path):
+            opscli.debug.log('ovsdb', opscli.debug.LOG_WARNING,
+                             "Ignoring schema cache %s: %s", path, e)
+        return None
+
+    return data
+
+
+def save_json(path, data):
+    # Written under another name first, so that other shells never read
+    # a partly written file.
+    tmp_path = "%s.%d" % (path, os.getpid())
+    try:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        f = open(tmp_path, 'w')
+        json.dump(data, f)
+        f.close()
+        os.rename(tmp_path, path)
+    except Exception as e:
+        opscli.debug.log('ovsdb', opscli.debug.LOG_WARNING,
+                         "Unable to cache schema in %s: %s", path, e)
+
+
+def load_cached(server, database):
+    '''Returns the cached copy of the schema server last sent for
+    database, or None.'''
+    index = load_json(cache_path(SCHEMA_INDEX))
+    if not isinstance(index, dict):
+        return None
+    cached_id = index.get("%s %s" % (server, database))
+    if cached_id is None:
+        return None
+    path = cache_path(cached_id + '.json')
+    schema = load_json(path)
+    if schema is None or schema_id(database, schema) != cached_id:
+        return None
+    dbg("Loaded schema %s", path)
+
+    return schema
+
+
+def save_cached(server, database, schema):
+    '''Cache a schema, as the one server now has for database.'''
+    new_id = schema_id(database, schema)
+    path = cache_path(new_id + '.json')
+    if not os.path.exists(path):
+        save_json(path, schema)
+    index_path = cache_path(SCHEMA_INDEX)
+    index = load_json(index_path)
+    if not isinstance(index, dict):
+        index = {}
+    key = "%s %s" % (server, database)
+    if index.get(key) != new_id:
+        dbg("Schema of %s changed to %s", key, new_id)
+        index[key] = new_id
+        save_json(index_path, index)
+
+
+def column_type(column):
+    '''Normalize a column type to a dict with 'key', optional 'value',
+    'min' and 'max'.'''
+    col_type = column['type']
+    if not isinstance(col_type, dict):
+        col_type = {'key': col_type}
+    return col_type
+
+
+def default_value(column):
+    '''The value OVSDB gives a column a new row doesn't set, in wire
+    format.'''
+    col_type = column_type(column)
+    if 'value' in col_type:
+        return ['map', []]
+    if col_type.get('min', 1) == 0:
+        return ['set', []]
+    return {
+        'integer': 0,
+        'real': 0.0,
+        'boolean': False,
+        'string': '',
+        'uuid': ['uuid', '00000000-0000-0000-0000-000000000000'],
+    }[base_type(col_type['key'])['type']]
+
+
+def base_type(base):
+    '''Normalize a base type to a dict with at least 'type'.'''
+    if not isinstance(base, dict):
+        base = {'type': base}
+    return base
+
+
+class Schema:
+    def __init__(self, schema):
+        self.name = schema.get('name')
+        self.version = schema.get('version')
+        self.tables = schema['tables']
+
+    def __repr__(self):
+        return "<%s %s %s>" % (self.__class__.__name__, self.name,
+                               self.version)
+
+    def get_column(self, table, column):
+        if table not in self.tables:
+            raise ESchemaViolation("no table '%s'" % table)
+        if column in IMPLICIT_COLUMNS:
+            return {'type': IMPLICIT_COLUMNS[column]}
+        columns = self.tables[table]['columns']
+        if column not in columns:
+            raise ESchemaViolation("no column '%s' in table '%s'" % (column,
+                                   table))
+        return columns[column]
+
+    def check_atom(self, where, base, atom):
+        base = base_type(base)
+        atom_type = base['type']
+        if atom_type == 'integer':
+            valid = isinstance(atom, (int, long)) and not isinstance(atom,
+                                                                     bool)
+        elif atom_type == 'real':
+            valid = isinstance(atom, (int, long, float))
+        elif atom_type == 'boolean':
+            valid = isinstance(atom, bool)
+        elif atom_type == 'string':
+            valid = isinstance(atom, basestring)
+        elif atom_type == 'uuid':
+            valid = (isinstance(atom, list) and len(atom) == 2 and
+                     atom[0] in ('uuid', 'named-uuid'))
+        else:
+            valid = True
+        if not valid:
+            raise ESchemaViolation("%s: expected %s, got %r" % (where,
+                                   atom_type, atom))
+        if 'enum' in base:
+            enum = base['enum']
+            if isinstance(enum, list) and enum[0] == 'set':
+                allowed = enum[1]
+            else:
+                allowed = [enum]
+            if atom not in allowed:
+                raise ESchemaViolation("%s: %r is not one of %s" % (where,
+                                       atom, allowed))
+
+    def check_set(self, where, col_type, items):
+        for atom in items:
+            self.check_atom(where, col_type['key'], atom)
+
+    def check_value(self, table, column, value, keys_only=False):
+        '''Check a value in OVSDB wire format against a column's type.
+        With keys_only a map column may also be given a set of keys, as
+        used when deleting map keys.'''
+        where = "%s:%s" % (table, column)
+        col_type = column_type(self.get_column(table, column))
+        self.check_typed(where, col_type, value, keys_only)
+
+    def check_typed(self, where, col_type, value, keys_only=False):
+        '''Like check_value(), against a column type already looked up.'''
+        is_map = 'value' in col_type
+        if isinstance(value, list) and value and value[0] == 'map':
+            if not is_map:
+                raise ESchemaViolation("%s is not a map" % where)
+            for key, map_value in value[1]:
+                self.check_atom(where, col_type['key'], key)
+                self.check_atom(where, col_type['value'], map_value)
+        elif isinstance(value, list) and value and value[0] == 'set':
+            if is_map and not keys_only:
+                raise ESchemaViolation("%s is a map" % where)
+            self.check_set(where, col_type, value[1])
+        elif is_map:
+            if not keys_only:
+                raise ESchemaViolation("%s is a map" % where)
+            self.check_atom(where, col_type['key'], value)
+        else:
+            self.check_atom(where, col_type['key'], value)
+
+    def check_conditions(self, table, conditions):
+        for condition in conditions:
+            column, function, value = condition
+            if function in ('includes', 'excludes'):
+                self.check_value(table, column, value, keys_only=True)
+            else:
+                self.check_value(table, column, value)
+
+    def check_operation(self, operation):
+        '''Raises ESchemaViolation if the operation does not fit the
+        schema.'''
+        op = operation.get('op')
+        table = operation.get('table')
+        if table not in self.tables:
+            raise ESchemaViolation("no table '%s'" % table)
+        self.check_conditions(table, operation.get('where', []))
+        for column in operation.get('columns', []):
+            self.get_column(table, column)
+        if op in ('insert', 'update'):
+            for column, value in operation['row'].items():
+                self.check_value(table, column, value)
+        elif op == 'mutate':
+            for column, mutator, value in operation['mutations']:
+                self.check_value(table, column, value,
+                                 keys_only=(mutator == 'delete'))
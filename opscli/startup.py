@@ -0,0 +1,129 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Timing of the phases of shell startup, up to the first prompt.
+
+Phases nest: a phase started while another is running is part of it.
+'''
+
+import os
+import time
+
+import opscli.trace
+
+
+_enabled = False
+# Finished phases, as (name, start, seconds, depth).
+_phases = []
+# Running phases, as (name, start).
+_running = []
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def active():
+    return _enabled
+
+
+def process_start_time():
+    '''Returns the time this process was started, or None if unknown.'''
+    try:
+        f = open('/proc/self/stat')
+        # The command name can contain spaces, so skip past it.
+        fields = f.read().rsplit(')', 1)[1].split()
+        f.close()
+        boot_time = None
+        for line in open('/proc/stat'):
+            if line.startswith('btime '):
+                boot_time = int(line.split()[1])
+        ticks = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
+        # Field 22 of the stat line is the start time in clock ticks.
+        return boot_time + float(fields[19]) / ticks
+    except Exception:
+        return None
+
+
+def add_phase(name, start, end):
+    '''Record a phase that was timed elsewhere.'''
+    if _enabled:
+        _phases.append((name, start, end - start, len(_running)))
+
+
+def phase_start(name):
+    if _enabled:
+        _running.append((name, time.time()))
+
+
+def phase_end():
+    if _enabled and _running:
+        name, start = _running.pop()
+        _phases.append((name, start, time.time() - start, len(_running)))
+
+
+def phase_tree():
+    '''Returns the phases in the order they started, as (name, start,
+    seconds, self seconds, depth).'''
+    phases = sorted(_phases, key=lambda phase: (phase[1], phase[3]))
+    results = []
+    for i, (name, start, seconds, depth) in enumerate(phases):
+        own = seconds
+        for child in phases[i + 1:]:
+            if child[3] <= depth:
+                break
+            if child[3] == depth + 1:
+                own -= child[2]
+        results.append((name, start, seconds, own, depth))
+
+    return results
+
+
+def report():
+    '''Returns the phases as lines of text, slowest first.'''
+    tree = phase_tree()
+    if not tree:
+        return []
+    first = min(phase[1] for phase in tree)
+    last = max(phase[1] + phase[2] for phase in tree)
+    lines = ["Startup took %.1f ms." % ((last - first) * 1000), '',
+             "%9s %9s  %s" % ('ms', 'self ms', 'phase')]
+    # Name every phase with the phases it is part of.
+    parents = []
+    named = []
+    for name, start, seconds, own, depth in tree:
+        parents[depth:] = [name]
+        named.append((own, seconds, ' / '.join(parents)))
+    for own, seconds, name in sorted(named, reverse=True):
+        lines.append("%9.1f %9.1f  %s" % (seconds * 1000, own * 1000, name))
+
+    return lines
+
+
+def write_trace(filename):
+    '''Write the phases as a trace file, in the Chrome trace event format.'''
+    events = []
+    for name, start, seconds, own, depth in phase_tree():
+        events.append({
+            'name': name,
+            'cat': 'startup',
+            'ph': 'X',
+            'ts': int(start * 1000000),
+            'dur': int(seconds * 1000000),
+            'pid': os.getpid(),
+            'tid': 0,
+        })
+    opscli.trace.write_trace_events(filename, events)
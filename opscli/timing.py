@@ -0,0 +1,161 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Timing of commands, as they run.
+
+With timing shown, every command is followed by a line with the time it
+took. Commands that take longer than the slow log threshold are appended
+to the slow log, along with the OVSDB requests they made.
+'''
+
+import os
+import json
+import time
+from collections import OrderedDict
+
+import opscli.ovsdb as ovsdb
+from opscli.output import cli_out, prompt_seconds
+
+
+SLOW_LOG_FILE = '~/.opscli_slow.log'
+# The slow log is rotated to a single backup when it gets bigger than this.
+SLOW_LOG_MAX_SIZE = 1024 * 1024
+
+_show_timing = False
+# In seconds, or None if the slow log is off.
+_slow_log_threshold = None
+# The command being timed.
+_current = None
+# Commands run by other commands are timed as part of the outermost one.
+_depth = 0
+
+
+class Command_timing:
+    '''Time spent in the phases of one command.'''
+    def __init__(self, line):
+        self.line = line
+        self.start = time.time()
+        self.mark_time = self.start
+        # Time spent at the pager prompt is not the command's.
+        self.prompt_start = prompt_seconds()
+        self.mark_prompt = self.prompt_start
+        self.phases = OrderedDict()
+
+    def mark(self, phase):
+        '''Charge the time since the last mark to phase.'''
+        now = time.time()
+        prompt = prompt_seconds()
+        seconds = now - self.mark_time - (prompt - self.mark_prompt)
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.mark_time = now
+        self.mark_prompt = prompt
+
+    def elapsed(self):
+        '''Seconds since the start, less those spent at the pager prompt.'''
+        return (time.time() - self.start -
+                (prompt_seconds() - self.prompt_start))
+
+
+def show_timing(enable):
+    global _show_timing
+    _show_timing = enable
+
+
+def timing_shown():
+    return _show_timing
+
+
+def set_slow_log(threshold_ms):
+    '''Log commands slower than threshold_ms, or none if None.'''
+    global _slow_log_threshold
+    if threshold_ms is None:
+        _slow_log_threshold = None
+    else:
+        _slow_log_threshold = threshold_ms / 1000.0
+
+
+def slow_log_threshold():
+    '''Returns the threshold in ms, or None.'''
+    if _slow_log_threshold is None:
+        return None
+    return int(_slow_log_threshold * 1000)
+
+
+def active():
+    return _show_timing or _slow_log_threshold is not None
+
+
+def command_start(line):
+    global _current, _depth
+    _depth += 1
+    if _depth > 1 or not active():
+        return
+    _current = Command_timing(line)
+    ovsdb.query_log_start()
+
+
+def mark(phase):
+    if _current is not None and _depth == 1:
+        _current.mark(phase)
+
+
+def command_end():
+    global _current, _depth
+    _depth -= 1
+    if _depth > 0 or _current is None:
+        return
+    timing = _current
+    _current = None
+    total = timing.elapsed()
+    queries = ovsdb.query_log_end()
+    if _show_timing:
+        cli_out(format_timing(timing, total, queries))
+    if _slow_log_threshold is not None and total >= _slow_log_threshold:
+        slow_log_append(timing, total, queries)
+
+
+def format_timing(timing, total, queries):
+    parts = []
+    for phase, seconds in timing.phases.items():
+        parts.append("%s %.1f ms" % (phase, seconds * 1000))
+    parts.append("ovsdb %.1f ms in %d round trips" % (queries.wait * 1000,
+                 queries.round_trips()))
+    return "Took %.1f ms: %s." % (total * 1000, ', '.join(parts))
+
+
+def slow_log_append(timing, total, queries):
+    '''Write one command to the slow log, as a line of JSON.'''
+    filename = os.path.expanduser(SLOW_LOG_FILE)
+    try:
+        if os.path.getsize(filename) > SLOW_LOG_MAX_SIZE:
+            os.rename(filename, filename + '.1')
+    except OSError:
+        pass
+    phases = OrderedDict()
+    for phase, seconds in timing.phases.items():
+        phases[phase] = round(seconds * 1000, 3)
+    phases['ovsdb'] = round(queries.wait * 1000, 3)
+    entry = OrderedDict((
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S',
+                               time.localtime(timing.start))),
+        ('command', timing.line),
+        ('ms', round(total * 1000, 3)),
+        ('phases', phases),
+        ('round_trips', queries.round_trips()),
+        ('queries', [json.loads(request) for request in queries.requests]),
+    ))
+    f = open(filename, 'a')
+    f.write(json.dumps(entry) + '\n')
+    f.close()
@@ -14,6 +14,7 @@
 # under the License.
 
 from copy import deepcopy
+from glob import glob
 
 from opscli.stringhelp import Str_help
 from ops.interface import get_interface_list
@@ -96,6 +97,9 @@ class TString(Token):
         return "<%s %s>" % (self.__class__.__name__, str(self.allowed))
 
     def nail(self, word):
+        if not self.allowed:
+            self.value = word
+            return
         for al in self.allowed:
             if al.startswith(word):
                 self.value = al
@@ -113,12 +117,17 @@ class TString(Token):
         return results
 
     def verify(self, word):
+        if not self.allowed:
+            # Any string will do.
+            return len(word) > 0
         for al in self.allowed:
             if al.startswith(word):
                 return True
         return False
 
     def syntax(self):
+        if not self.allowed:
+            return [Str_help(('<string>', self.help_text))]
         return self.allowed
 
 
@@ -202,6 +211,33 @@ class TInterface(Token):
         return [Str_help(('<interface>', self.help_text))]
 
 
+class TFilename(Token):
+    description = 'File name'
+
+    def __init__(self, **kwargs):
+        Token.__init__(self, **kwargs)
+        if not self.help_text:
+            self.help_text = 'File name'
+
+    def nail(self, word):
+        if not self.verify(word):
+            raise ValueError("invalid file name")
+        self.value = word
+
+    def enum(self):
+        return []
+
+    def complete(self, word):
+        return sorted(glob(word + '*'))
+
+    def verify(self, word):
+        # Any path will do, it's only opened when the command runs.
+        return len(word) > 0
+
+    def syntax(self):
+        return [Str_help(('<filename>', self.help_text))]
+
+
 def check_ipv4(ipaddress):
     try:
         quad = ipaddress.split('.')
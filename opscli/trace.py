@@ -0,0 +1,217 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Tracing of commands as nested spans, written in the Chrome trace event
+format.
+
+Spans are recorded for the command, its option parsing and run() method,
+every function in the ops and config packages, every OVSDB request and
+every function in opscli.output. They are found with a profile hook, so
+nothing needs to be instrumented. The hook is only set while a command
+runs with tracing on, so neither the shell between commands nor anything
+while tracing is off is slowed down. It skips calls outside the packages
+in TRACED_PACKAGES and the command modules straight away.
+'''
+
+import os
+import sys
+import json
+import time
+from inspect import CO_OPTIMIZED
+
+
+# Beyond this many spans, further spans are dropped.
+TRACE_MAX_EVENTS = 200000
+
+# Only functions in these packages, and in the command modules, are traced.
+TRACED_PACKAGES = ('opscli', 'ops', 'config')
+
+# Functions in opscli.ovsdb that are OVSDB requests.
+OVSDB_REQUESTS = ('connect', 'close', 'get_schema', 'transact', 'query',
+                  'query_prepared')
+# Functions too small to be worth a span.
+SKIPPED = ('cli_out', 'cli_wrt', 'dbg')
+
+_filename = None
+_events = []
+_dropped = 0
+# Spans being recorded, as (code, name, category, start, args). A command
+# span has no code.
+_stack = []
+# code -> (name, category, args function), or None if not traced.
+_kinds = {}
+# Directories the command modules were loaded from.
+_command_paths = set()
+# Commands running, counting those run from another command.
+_depth = 0
+
+
+def active():
+    return _filename is not None
+
+
+def add_command_path(path):
+    '''Trace the command modules in path.'''
+    _command_paths.add(os.path.abspath(path))
+
+
+def table_args(frame):
+    table = frame.f_locals.get('table')
+    if table is None and 'prepared' in frame.f_locals:
+        table = frame.f_locals['prepared'].table
+    if table is None:
+        return None
+    return {'table': table}
+
+
+def classify(frame):
+    '''Returns (span name, category, args function) for the function
+    called in frame, or None if it isn't traced.'''
+    # Imported here, as opscli.command imports opscli.startup, which
+    # imports this module.
+    from opscli.command import Command
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '')
+    if module.split('.')[0] not in TRACED_PACKAGES:
+        path = os.path.dirname(os.path.abspath(code.co_filename))
+        if path not in _command_paths:
+            return None
+    if not code.co_flags & CO_OPTIMIZED or code.co_name in SKIPPED:
+        # Module and class bodies aren't functions.
+        return None
+    if module == 'opscli.cli':
+        if code.co_name == 'parse_command':
+            return 'parse', 'parse', None
+    elif code.co_name == 'run' and isinstance(frame.f_locals.get('self'),
+                                              Command):
+        name = "%s.run" % frame.f_locals['self'].__class__.__name__
+        return name, 'run', None
+    elif module.startswith('ops.') or module.startswith('config.'):
+        return "%s.%s" % (module, code.co_name), module.split('.')[0], None
+    elif module == 'opscli.ovsdb' and code.co_name in OVSDB_REQUESTS:
+        return "ovsdb.%s" % code.co_name, 'ovsdb', table_args
+    elif module == 'opscli.output':
+        return code.co_name, 'render', None
+
+    return None
+
+
+def add_event(name, category, start, args):
+    global _dropped
+    if len(_events) >= TRACE_MAX_EVENTS:
+        _dropped += 1
+        return
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': int(start * 1000000),
+        'dur': int((time.time() - start) * 1000000),
+        'pid': os.getpid(),
+        'tid': 0,
+    }
+    if args:
+        event['args'] = args
+    _events.append(event)
+
+
+def profile(frame, event, arg):
+    if event == 'call':
+        code = frame.f_code
+        kind = _kinds.get(code, False)
+        if kind is False:
+            kind = _kinds[code] = classify(frame)
+        if kind is not None:
+            name, category, args_fn = kind
+            args = None
+            if args_fn is not None:
+                args = args_fn(frame)
+            _stack.append((code, name, category, time.time(), args))
+    elif event == 'return':
+        if _stack and _stack[-1][0] is frame.f_code:
+            code, name, category, start, args = _stack.pop()
+            add_event(name, category, start, args)
+
+
+def install():
+    '''Set the profile hook if a command is being traced, e.g. after
+    another profiler replaced it.'''
+    if active() and _depth:
+        sys.setprofile(profile)
+
+
+def command_start(words):
+    '''Start the span of a command, and set the profile hook for the
+    duration of the outermost command.'''
+    global _depth
+    if not active():
+        return
+    _stack.append((None, 'command', 'command', time.time(),
+                   {'line': ' '.join(words)}))
+    _depth += 1
+    if _depth == 1:
+        sys.setprofile(profile)
+
+
+def command_end():
+    '''End the span of the innermost command running.'''
+    global _depth
+    if not active() or not _depth:
+        # Tracing was started or stopped by this command.
+        return
+    _depth -= 1
+    if not _depth:
+        sys.setprofile(None)
+    while _stack:
+        code, name, category, start, args = _stack.pop()
+        if code is None:
+            add_event(name, category, start, args)
+            break
+
+
+def start(filename):
+    '''Start tracing, to be written to filename.'''
+    global _filename, _dropped, _depth
+    _filename = filename
+    del _events[:]
+    del _stack[:]
+    _dropped = 0
+    _depth = 0
+
+
+def stop():
+    '''Stop tracing, and write the trace file. Returns the number of spans
+    written and dropped.'''
+    global _filename, _depth
+    if not active():
+        return 0, 0
+    if _depth:
+        sys.setprofile(None)
+    _depth = 0
+    write_trace_events(_filename, _events)
+    _filename = None
+    results = len(_events), _dropped
+    del _events[:]
+    del _stack[:]
+
+    return results
+
+
+def write_trace_events(filename, events):
+    '''Write events to a file in the Chrome trace event format, which can
+    be loaded into chrome://tracing.'''
+    f = open(filename, 'w')
+    json.dump({'traceEvents': events}, f)
+    f.close()
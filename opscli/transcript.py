@@ -0,0 +1,134 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Recording of command lines and the OVSDB exchanges they cause, for serving
+back later with tools.replay.
+
+A transcript has one JSON object per line, each with one of these keys:
+
+    schema      the database schema, if one was cached when recording started
+    command     a command line, as typed
+    request     a request sent to the server, with the matching "reply"
+'''
+
+import json
+
+import opscli.debug
+import opscli.schema
+
+
+_recorder = None
+
+
+def dbg(msg, *args):
+    opscli.debug.logline('ovsdb', msg, *args)
+
+
+class Recorder:
+    def __init__(self, filename):
+        self.file = open(filename, 'a')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, sort_keys=True) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Recording_socket:
+    '''Wraps a socket, pairing each reply with the request it answers.'''
+    def __init__(self, sock, recorder):
+        self.socket = sock
+        self.recorder = recorder
+        self.decoder = json.JSONDecoder()
+        self.sent = ''
+        self.received = ''
+        # id -> request
+        self.pending = {}
+
+    def __getattr__(self, name):
+        return getattr(self.socket, name)
+
+    def messages(self, data):
+        '''Returns (complete messages, rest of data).'''
+        messages = []
+        while True:
+            data = data.lstrip()
+            if not data:
+                break
+            try:
+                msg, end = self.decoder.raw_decode(data)
+            except ValueError:
+                break
+            messages.append(msg)
+            data = data[end:]
+
+        return messages, data
+
+    def send(self, data):
+        sent = self.socket.send(data)
+        messages, self.sent = self.messages(self.sent + data[:sent])
+        for msg in messages:
+            if msg.get('id') is not None:
+                self.pending[json.dumps(msg['id'])] = msg
+        return sent
+
+    def recv(self, size):
+        data = self.socket.recv(size)
+        messages, self.received = self.messages(self.received + data)
+        for msg in messages:
+            request = self.pending.pop(json.dumps(msg.get('id')), None)
+            if request is None:
+                # Notification, or a reply to nothing we sent.
+                continue
+            del request['id']
+            del msg['id']
+            self.recorder.write({'request': request, 'reply': msg})
+        return data
+
+
+def record_start(filename, server, database):
+    '''Start appending to a transcript.'''
+    global _recorder
+    record_stop()
+    _recorder = Recorder(filename)
+    schema = opscli.schema.load_cached(server, database)
+    if schema is not None:
+        _recorder.write({'schema': schema})
+    dbg("Recording to %s", filename)
+
+
+def record_stop():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def recording():
+    return _recorder is not None
+
+
+def record_command(line):
+    if _recorder is not None:
+        _recorder.write({'command': line})
+
+
+def wrap(sock):
+    '''Returns sock, recording its exchanges if a transcript is open.'''
+    if _recorder is None:
+        return sock
+    return Recording_socket(sock, _recorder)
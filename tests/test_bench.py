@@ -0,0 +1,45 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+The benchmarks' own measurements.
+'''
+
+import unittest
+
+import opscli.ovsdb as ovsdb
+from tools import bench, bench_ovsdb
+
+
+class Test_bench_ovsdb(unittest.TestCase):
+    def setUp(self):
+        # The benchmarks point opscli.ovsdb at their own servers.
+        self.ovsdb = ovsdb._ovsdb
+        self.open_socket = ovsdb.Ovsdb.open_socket
+
+    def tearDown(self):
+        ovsdb._ovsdb = self.ovsdb
+        ovsdb.Ovsdb.open_socket = self.open_socket
+
+    def test_bytes_counted(self):
+        results = bench_ovsdb.run(['small'], 1)
+        self.assertEqual(sorted(results['small']),
+                         sorted(name for name, fn in bench_ovsdb.BENCHMARKS))
+        # All of these talk to the server, including over connections of
+        # their own.
+        self.assertEqual(bench.missing_bytes(results), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
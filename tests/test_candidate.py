@@ -0,0 +1,133 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Candidate configuration, against a stand-in server.
+'''
+
+import os
+import tempfile
+import unittest
+
+import opscli.cli
+import opscli.ovsdb as ovsdb
+from opscli.cli import Opscli
+from opscli.context import context_names, context_pop
+from tools import bench
+
+
+COMMAND_MODULE_PATHS = ['cli-commands']
+SCALE = {'interfaces': 4, 'vlans': 3}
+SOCKET_PATH = '/tmp/opscli-test-%d.sock' % os.getpid()
+
+# The shell can only be set up once per process, so every test gets a
+# fresh stand-in server on the same socket instead.
+_cli = None
+
+
+class Test_candidate(unittest.TestCase):
+    def setUp(self):
+        global _cli
+        self.standin = bench.Standin(SCALE, SOCKET_PATH)
+        if _cli is None:
+            _cli = Opscli(self.standin.server,
+                          command_module_paths=COMMAND_MODULE_PATHS,
+                          interactive=False)
+        self.cli = _cli
+
+    def tearDown(self):
+        ovsdb.transaction_abort()
+        while len(context_names()) > 1:
+            context_pop()
+        self.standin.stop()
+
+    def run_lines(self, *lines):
+        for line in lines:
+            self.cli.process_line(line)
+            self.assertFalse(self.cli.failed, line)
+
+    def run_failing(self, line):
+        self.cli.process_line(line)
+        self.assertTrue(self.cli.failed, line)
+
+    def vlan_ids(self):
+        return sorted(row['id'] for row in ovsdb.get('VLAN', ['id']))
+
+    def test_create_vlan_twice(self):
+        self.run_lines('configure candidate', 'vlan 30', 'exit', 'vlan 30',
+                       'no shutdown', 'exit')
+        self.assertEqual(self.vlan_ids(), [1, 2, 3, 30])
+        self.run_lines('commit')
+        self.assertEqual(self.vlan_ids(), [1, 2, 3, 30])
+        rows = ovsdb.get('VLAN', ['admin'], [['id', '==', 30]])
+        self.assertEqual(rows, [{'admin': 'up'}])
+
+    def test_delete_created_vlan(self):
+        self.run_lines('configure candidate', 'vlan 30', 'exit', 'no vlan 30',
+                       'no vlan 2')
+        self.assertEqual(self.vlan_ids(), [1, 3])
+        self.run_lines('commit')
+        self.assertEqual(self.vlan_ids(), [1, 3])
+
+    def test_leave_with_pending_writes(self):
+        self.run_lines('configure candidate', 'vlan 30', 'exit')
+        # Leaving the candidate, directly or by running a command from
+        # outside the config context, must not lose it.
+        self.run_failing('exit')
+        self.run_failing('quit')
+        self.run_failing('configure terminal')
+        self.assertEqual(context_names(), ['root', 'config'])
+        self.assertTrue(ovsdb.transaction_pending())
+        self.run_lines('abort', 'exit')
+        self.assertEqual(context_names(), ['root'])
+        self.assertFalse(ovsdb.transaction_active())
+        self.assertEqual(self.vlan_ids(), [1, 2, 3])
+        # Writes after leaving are not queued in the old candidate.
+        self.run_lines('configure', 'vlan 31', 'exit', 'exit')
+        self.assertEqual(self.vlan_ids(), [1, 2, 3, 31])
+
+    def test_leave_after_commit(self):
+        self.run_lines('configure candidate', 'vlan 30', 'exit', 'commit')
+        self.assertFalse(ovsdb.transaction_pending())
+        self.run_lines('exit')
+        self.assertFalse(ovsdb.transaction_active())
+        self.assertEqual(self.vlan_ids(), [1, 2, 3, 30])
+
+    def test_ctrl_d_with_pending_writes(self):
+        self.run_lines('configure candidate', 'vlan 30', 'exit')
+        lines = [EOFError, 'abort', EOFError]
+
+        def readline():
+            line = lines.pop(0)
+            if line is EOFError:
+                raise EOFError
+            return line
+        self.cli.readline = readline
+        history = tempfile.NamedTemporaryFile()
+        old_history = opscli.cli.HISTORY_FILE
+        opscli.cli.HISTORY_FILE = history.name
+        try:
+            self.cli.start_shell()
+        finally:
+            opscli.cli.HISTORY_FILE = old_history
+            del self.cli.readline
+            history.close()
+        # The first ctrl-d was refused, the one after the abort was not.
+        self.assertEqual(lines, [])
+        self.assertFalse(ovsdb.transaction_pending())
+        self.assertEqual(self.vlan_ids(), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
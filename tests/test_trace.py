@@ -0,0 +1,78 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Tracing of commands.
+'''
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+import opscli.trace as trace
+from ops.vlan import port_sort_key
+
+
+def untraced():
+    return port_sort_key('1-10')
+
+
+class Test_trace(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        trace.start(self.filename)
+
+    def tearDown(self):
+        trace.stop()
+        os.unlink(self.filename)
+
+    def spans(self):
+        trace.stop()
+        events = json.load(open(self.filename))['traceEvents']
+        return [(event['name'], event['cat']) for event in events]
+
+    def test_hook_only_during_command(self):
+        self.assertIsNone(sys.getprofile())
+        trace.command_start(['show', 'vlan'])
+        self.assertIs(sys.getprofile(), trace.profile)
+        untraced()
+        trace.command_end()
+        self.assertIsNone(sys.getprofile())
+        untraced()
+        # Only the ops function within the command, not the test's own.
+        self.assertEqual(self.spans(), [('ops.vlan.port_sort_key', 'ops'),
+                                        ('command', 'command')])
+
+    def test_nested_command(self):
+        trace.command_start(['debug', 'profile', 'show', 'vlan'])
+        trace.command_start(['show', 'vlan'])
+        trace.command_end()
+        self.assertIs(sys.getprofile(), trace.profile)
+        trace.command_end()
+        self.assertIsNone(sys.getprofile())
+        self.assertEqual(self.spans(), [('command', 'command')] * 2)
+
+    def test_stop_during_command(self):
+        trace.command_start(['no', 'debug', 'trace'])
+        trace.stop()
+        self.assertIsNone(sys.getprofile())
+        trace.command_end()
+        self.assertIsNone(sys.getprofile())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,273 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Helpers shared by the benchmarks: running the stand-in and replay servers,
+timing calls, and comparing results against a saved baseline.
+'''
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import subprocess
+
+
+# Stand-in server scales, as arguments to tools.standin.
+SCALES = {
+    'small': {'interfaces': 52, 'vlans': 16, 'map_keys': 0, 'radius': 2},
+    'medium': {'interfaces': 256, 'vlans': 1024, 'map_keys': 50,
+               'radius': 16},
+    'large': {'interfaces': 512, 'vlans': 4094, 'map_keys': 200,
+              'radius': 64},
+}
+
+STANDIN_OPTIONS = {
+    'interfaces': '-i',
+    'vlans': '-v',
+    'map_keys': '-m',
+    'radius': '-r',
+    'aliases': '-a',
+}
+
+# Stop a benchmark after this many seconds, once it has run MIN_ITERATIONS.
+TIME_BUDGET = 10.0
+MIN_ITERATIONS = 5
+
+# A result is a regression if it is this much worse than the baseline.
+THRESHOLD = 0.10
+
+# Results where smaller is better, and larger is better.
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'bytes_sent', 'bytes_received',
+                   'objects')
+HIGHER_IS_BETTER = ('ops_per_sec', )
+
+
+class Tool_server:
+    '''A server from tools, running in a child process.'''
+    def __init__(self, module, args, path=None):
+        if path is None:
+            path = '/tmp/opscli-bench-%d.sock' % os.getpid()
+        self.path = path
+        self.server = 'unix:' + path
+        args = [sys.executable, '-m', module, '-s', self.server] + args
+        self.process = subprocess.Popen(args, stdout=subprocess.PIPE)
+        # The server prints a line once it is listening.
+        self.process.stdout.readline()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class Standin(Tool_server):
+    '''A stand-in server with data of the given scale.'''
+    def __init__(self, scale, path=None):
+        args = []
+        for key, value in sorted(scale.items()):
+            args.extend([STANDIN_OPTIONS[key], str(value)])
+        Tool_server.__init__(self, 'tools.standin', args, path)
+
+
+class Replay(Tool_server):
+    '''A server replaying transcripts.'''
+    def __init__(self, transcripts, path=None):
+        Tool_server.__init__(self, 'tools.replay', list(transcripts), path)
+
+
+class Counting_socket:
+    '''Wraps a socket, counting the bytes that go through it.'''
+    def __init__(self, sock, counts):
+        self.socket = sock
+        self.counts = counts
+
+    def __getattr__(self, name):
+        return getattr(self.socket, name)
+
+    def send(self, data):
+        sent = self.socket.send(data)
+        self.counts['sent'] += sent
+        return sent
+
+    def sendall(self, data):
+        self.socket.sendall(data)
+        self.counts['sent'] += len(data)
+
+    def recv(self, size):
+        data = self.socket.recv(size)
+        self.counts['received'] += len(data)
+        return data
+
+
+def count_bytes(ovsdb_class):
+    '''Make every connection ovsdb_class opens count its traffic, whether
+    it is the shared one or one of its own, as query_iter() opens. Returns
+    the dict holding the counts.'''
+    counts = {'sent': 0, 'received': 0}
+    open_socket = ovsdb_class.open_socket
+
+    def counting_open_socket(self):
+        return Counting_socket(open_socket(self), counts)
+    ovsdb_class.open_socket = counting_open_socket
+
+    return counts
+
+
+def missing_bytes(results):
+    '''Returns the (group, benchmark) of results that were measured with
+    byte counts, but have none sent or received.'''
+    missing = []
+    for group in sorted(results):
+        for name in sorted(results[group]):
+            result = results[group][name]
+            if 'bytes_sent' not in result:
+                continue
+            if not result['bytes_sent'] or not result['bytes_received']:
+                missing.append((group, name))
+
+    return missing
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = int(round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(times):
+    '''Latency and throughput of a list of times, in seconds.'''
+    total = sum(times)
+    return {
+        'iterations': len(times),
+        'p50_ms': percentile(times, 0.5) * 1000,
+        'p99_ms': percentile(times, 0.99) * 1000,
+        'ops_per_sec': len(times) / total if total else 0.0,
+    }
+
+
+def measure(fn, iterations, counts=None, budget=TIME_BUDGET):
+    '''Call fn iterations times, or fewer if that takes longer than the
+    time budget. Returns a dict of results. Objects are the container
+    objects each call left alive, while gc is off; Python 2 cannot count
+    every allocation.'''
+    fn()
+    times = []
+    objects = 0
+    if counts is not None:
+        counts['sent'] = counts['received'] = 0
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(iterations):
+            before = gc.get_count()[0]
+            start = time.time()
+            result = fn()
+            times.append(time.time() - start)
+            objects += gc.get_count()[0] - before
+            del result
+            if gc.get_count()[0] > 100000:
+                gc.collect()
+            if len(times) >= MIN_ITERATIONS and sum(times) > budget:
+                break
+    finally:
+        gc.enable()
+    iterations = len(times)
+    results = summarize(times)
+    results['objects'] = objects / float(iterations)
+    if counts is not None:
+        results['bytes_sent'] = counts['sent'] / float(iterations)
+        results['bytes_received'] = counts['received'] / float(iterations)
+
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save(filename, results):
+    f = open(filename, 'w')
+    json.dump(results, f, indent=2, sort_keys=True)
+    f.close()
+
+
+def load(filename):
+    f = open(filename)
+    results = json.load(f)
+    f.close()
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    '''Compare two {group: {benchmark: {result: value}}} trees. Returns a
+    list of (group, benchmark, result, old, new, change, regressed).'''
+    changes = []
+    for group in sorted(results):
+        for name in sorted(results[group]):
+            old_results = baseline.get(group, {}).get(name)
+            if old_results is None:
+                continue
+            for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                if key not in results[group][name] or key not in old_results:
+                    continue
+                old = old_results[key]
+                new = results[group][name][key]
+                if not old:
+                    continue
+                change = (new - old) / float(old)
+                if key in LOWER_IS_BETTER:
+                    regressed = change > threshold
+                else:
+                    regressed = change < -threshold
+                changes.append((group, name, key, old, new, change,
+                                regressed))
+
+    return changes
+
+
+def print_results(results, columns, group_name='scale'):
+    print "%-10s %-28s" % (group_name, 'benchmark'),
+    print ' '.join("%14s" % c for c in columns)
+    for group in sorted(results):
+        for name in sorted(results[group]):
+            print "%-10s %-28s" % (group, name),
+            values = []
+            for column in columns:
+                value = results[group][name].get(column)
+                if value is None:
+                    values.append("%14s" % '-')
+                else:
+                    values.append("%14.2f" % value)
+            print ' '.join(values)
+
+
+def print_comparison(changes):
+    '''Print changes against the baseline. Returns the number of
+    regressions.'''
+    regressions = 0
+    for group, name, key, old, new, change, regressed in changes:
+        mark = ''
+        if regressed:
+            mark = '  REGRESSION'
+            regressions += 1
+        print "%-10s %-28s %-15s %12.2f -> %12.2f %+7.1f%%%s" % (group, name,
+              key, old, new, change * 100, mark)
+
+    return regressions
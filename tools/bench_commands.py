@@ -0,0 +1,209 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Benchmark command lines end to end, with the OVSDB replies served from
+transcripts recorded with ops-cli -r.
+
+    python -m tools.bench_commands [-n <iterations>] [-o <results.json>]
+                                   [-b <baseline.json>] <transcript>...
+
+The time each command takes is split into parsing, database and
+rendering. Database time is spent in the OVSDB transport: connecting,
+sending and receiving. Rendering is the rest of running the command,
+including decoding rows and writing the output.
+'''
+
+import os
+import sys
+import time
+from getopt import getopt
+from StringIO import StringIO
+
+import opscli.ovsdb as ovsdb
+from opscli.cli import Opscli
+from opscli.context import context_names, context_pop
+from tools import bench
+from tools.replay import Transcript
+
+
+ITERATIONS = 50
+COMMAND_MODULE_PATHS = ('cli-commands', )
+
+PHASES = ('parse', 'db', 'render', 'other')
+
+# Where time is charged, innermost first.
+TIMED_METHODS = (
+    (ovsdb.Ovsdb, ('connect', 'close', 'send', 'send_raw', 'receive',
+                   'receive_chunk'), 'db'),
+    (Opscli, ('parse_command', ), 'parse'),
+    (Opscli, ('run_command', ), 'render'),
+)
+
+COLUMNS = ('p50_ms', 'p99_ms', 'ops_per_sec', 'parse_ms', 'db_ms',
+           'render_ms')
+
+
+class Phase_timer:
+    '''Charges wall time to the innermost phase being timed.'''
+    def __init__(self):
+        self.stack = []
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.mark = time.time()
+
+    def switch(self):
+        now = time.time()
+        if self.stack:
+            phase = self.stack[-1]
+        else:
+            phase = 'other'
+        self.totals[phase] += now - self.mark
+        self.mark = now
+
+    def enter(self, phase):
+        self.switch()
+        self.stack.append(phase)
+
+    def leave(self):
+        self.switch()
+        self.stack.pop()
+
+    def wrap(self, cls, name, phase):
+        fn = getattr(cls, name)
+
+        def timed(*args, **kwargs):
+            self.enter(phase)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.leave()
+        setattr(cls, name, timed)
+
+
+def reset_shell():
+    '''Back to the root context, without a candidate configuration.'''
+    while len(context_names()) > 1:
+        context_pop()
+    if ovsdb.transaction_active():
+        ovsdb.transaction_abort()
+
+
+def run_commands(cli, timer, commands, iterations):
+    '''Run the commands in order, iterations times. Returns {command line:
+    results}.'''
+    samples = {}
+    for line in commands:
+        samples[line] = []
+    for i in range(iterations):
+        reset_shell()
+        for line in commands:
+            timer.reset()
+            start = time.time()
+            cli.process_line(line)
+            elapsed = time.time() - start
+            timer.switch()
+            samples[line].append((elapsed, dict(timer.totals)))
+
+    results = {}
+    for line, runs in samples.items():
+        results[line] = bench.summarize([elapsed for elapsed, phases in runs])
+        for phase in PHASES:
+            phase_total = sum(phases[phase] for elapsed, phases in runs)
+            results[line][phase + '_ms'] = phase_total / len(runs) * 1000
+
+    return results
+
+
+def run(transcripts, iterations, verbose=False):
+    timer = Phase_timer()
+    for cls, names, phase in TIMED_METHODS:
+        for name in names:
+            timer.wrap(cls, name, phase)
+    cli = None
+    results = {}
+    for filename in transcripts:
+        commands = Transcript([filename]).commands
+        replay = bench.Replay([filename])
+        stdout = sys.stdout
+        output = StringIO()
+        try:
+            sys.stdout = output
+            if cli is None:
+                # The command trees can only be loaded once.
+                cli = Opscli(replay.server,
+                             command_module_paths=COMMAND_MODULE_PATHS,
+                             interactive=False)
+            else:
+                ovsdb.Ovsdb(replay.server)
+            # A first pass, so the output can be checked.
+            run_commands(cli, timer, commands, 1)
+            if verbose:
+                stdout.write(output.getvalue())
+            sys.stdout = open(os.devnull, 'w')
+            name = os.path.basename(filename)
+            results[name] = run_commands(cli, timer, commands, iterations)
+        finally:
+            sys.stdout = stdout
+            replay.stop()
+
+    return results
+
+
+def usage():
+    print "Usage: python -m tools.bench_commands [-h] [-v] [-n <iterations>]"
+    print "               [-o <results file>] [-b <baseline file>]"
+    print "               [-t <threshold %>] <transcript>..."
+    sys.exit()
+
+
+def main(args):
+    iterations = ITERATIONS
+    output = baseline = None
+    threshold = bench.THRESHOLD
+    verbose = False
+    opts, args = getopt(args, 'hvn:o:b:t:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-v':
+            verbose = True
+        elif opt == '-n':
+            iterations = int(arg)
+        elif opt == '-o':
+            output = arg
+        elif opt == '-b':
+            baseline = arg
+        elif opt == '-t':
+            threshold = float(arg) / 100
+    if not args:
+        usage()
+
+    results = run(args, iterations, verbose)
+    bench.print_results(results, COLUMNS, 'transcript')
+    if output:
+        bench.save(output, {'environment': bench.environment(),
+                            'results': results})
+    if baseline:
+        print
+        changes = bench.compare(results, bench.load(baseline)['results'],
+                                threshold)
+        if bench.print_comparison(changes):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,246 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Measure how long the shell takes to handle each key, by typing scripted
+keystrokes into it through a fake console.
+
+    python -m tools.bench_keys [-n <iterations>] [-i <interfaces>,...]
+                               [-c <extra commands>,...] [-k <script file>]
+                               [-o <results.json>] [-b <baseline.json>]
+
+The time for a key runs from reading it to the screen being redrawn. For
+Enter it includes running the command line. Each combination of interface
+count and command tree size runs in a process of its own, against its own
+stand-in server.
+'''
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from getopt import getopt
+from multiprocessing import Pool
+
+from pyrepl.console import Console, Event
+
+from tools import bench
+from tools.bench_parser import write_modules
+
+
+ITERATIONS = 20
+COMMAND_MODULE_PATHS = ('cli-commands', )
+
+# One command line per script, with \t for Tab. Completing a word adds
+# the space after it. Every script must end in Enter.
+SCRIPTS = (
+    'sh\tint\t?\r',
+    'show interface ?1\r',
+    'show vlan ?\r',
+    'sh\tll\t?configuration\r',
+    'show running-configuration\r',
+    'show sy\t\r',
+    'con\tt\t\r',
+    'lldp ?holdtime 5\r',
+    'exit\r',
+)
+
+# Keys with a latency of their own. Any other key is a 'key'.
+KEY_NAMES = {
+    '?': 'qhelp',
+    '\t': 'tab',
+    '\r': 'enter',
+}
+
+# Extra generated commands, so lookups have a larger tree to search.
+EXTRA_TREE = {'depth': 3, 'stanzas': 4, 'choices': 32}
+
+
+class Fake_console(Console):
+    '''A console with scripted keys, which keeps what it would show.'''
+    def __init__(self, width=80, height=25):
+        self.width = width
+        self.height = height
+        self.encoding = 'utf-8'
+        self.screen = []
+        self.events = []
+        self.refreshes = 0
+
+    def type(self, keys):
+        for key in keys:
+            self.events.append(Event('key', unicode(key), key))
+
+    def refresh(self, screen, xy):
+        self.screen = screen
+        self.refreshes += 1
+
+    def get_event(self, block=1):
+        if not self.events:
+            if block:
+                raise EOFError
+            return None
+        return self.events.pop(0)
+
+    def getheightwidth(self):
+        return self.height, self.width
+
+    def push_char(self, char):
+        self.type(char)
+
+    def forgetinput(self):
+        self.events = []
+
+    def getpending(self):
+        return Event('key', u'', '')
+
+
+def type_script(cli, console, script, samples):
+    '''Type one script into the shell, adding per key times to samples.'''
+    cli.ps1 = cli.make_prompt()
+    cli.prepare()
+    try:
+        cli.refresh()
+        for key in script:
+            console.type(key)
+            start = time.time()
+            cli.handle1()
+            if cli.finished:
+                cli.restore()
+                cli.process_line(cli.get_buffer())
+            samples[KEY_NAMES.get(key, 'key')].append(time.time() - start)
+    finally:
+        if not cli.finished:
+            cli.restore()
+
+
+def run_case(args):
+    '''Type all scripts, iterations times, in a worker process.'''
+    server, extra_commands, scripts, iterations = args
+    from opscli.cli import Opscli
+    directory = tempfile.mkdtemp(prefix='opscli-bench-')
+    paths = list(COMMAND_MODULE_PATHS)
+    stdout = sys.stdout
+    try:
+        if extra_commands:
+            tree = dict(EXTRA_TREE, commands=extra_commands)
+            write_modules(directory, tree)
+            paths.append(directory)
+        console = Fake_console()
+        cli = Opscli(server, command_module_paths=paths, console=console)
+        samples = {}
+        for name in KEY_NAMES.values() + ['key']:
+            samples[name] = []
+        sys.stdout = open(os.devnull, 'w')
+        for i in range(iterations):
+            for script in scripts:
+                type_script(cli, console, script, samples)
+        refreshes = console.refreshes
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(directory)
+
+    results = {}
+    for name, times in samples.items():
+        if times:
+            results[name] = bench.summarize(times)
+    keys = sum(len(times) for times in samples.values())
+    results['key']['refreshes_per_key'] = refreshes / float(keys)
+
+    return results
+
+
+def load_scripts(filename):
+    '''One script per line, with \\t for Tab; Enter is added.'''
+    scripts = []
+    for line in open(filename):
+        line = line.rstrip('\n')
+        if line:
+            scripts.append(line.replace('\\t', '\t') + '\r')
+    return scripts
+
+
+def run(interface_counts, tree_sizes, scripts, iterations):
+    results = {}
+    for interfaces in interface_counts:
+        scale = dict(bench.SCALES['small'], interfaces=interfaces)
+        standin = bench.Standin(scale)
+        try:
+            for extra_commands in tree_sizes:
+                # A fresh process for every command tree.
+                pool = Pool(processes=1, maxtasksperchild=1)
+                try:
+                    case = "i%d/c%d" % (interfaces, extra_commands)
+                    results[case] = pool.apply(run_case, ((standin.server,
+                                               extra_commands, scripts,
+                                               iterations), ))
+                finally:
+                    pool.terminate()
+                    pool.join()
+        finally:
+            standin.stop()
+
+    return results
+
+
+def usage():
+    print "Usage: python -m tools.bench_keys [-h] [-n <iterations>]"
+    print "               [-i <interfaces>,...] [-c <extra commands>,...]"
+    print "               [-k <script file>] [-o <results file>]"
+    print "               [-b <baseline file>] [-t <threshold %>]"
+    sys.exit()
+
+
+def main(args):
+    iterations = ITERATIONS
+    interface_counts = [52, 512]
+    tree_sizes = [0, 1000]
+    scripts = SCRIPTS
+    output = baseline = None
+    threshold = bench.THRESHOLD
+    opts, args = getopt(args, 'hn:i:c:k:o:b:t:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-n':
+            iterations = int(arg)
+        elif opt == '-i':
+            interface_counts = [int(count) for count in arg.split(',')]
+        elif opt == '-c':
+            tree_sizes = [int(count) for count in arg.split(',')]
+        elif opt == '-k':
+            scripts = load_scripts(arg)
+        elif opt == '-o':
+            output = arg
+        elif opt == '-b':
+            baseline = arg
+        elif opt == '-t':
+            threshold = float(arg) / 100
+
+    results = run(interface_counts, tree_sizes, scripts, iterations)
+    bench.print_results(results, ('p50_ms', 'p99_ms', 'ops_per_sec'),
+                        'case')
+    if output:
+        bench.save(output, {'environment': bench.environment(),
+                            'results': results})
+    if baseline:
+        print
+        changes = bench.compare(results, bench.load(baseline)['results'],
+                                threshold)
+        if bench.print_comparison(changes):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,151 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Benchmark the OVSDB client layer against the stand-in server.
+
+    python -m tools.bench_ovsdb [-n <iterations>] [-s <scale>,...]
+                                [-o <results.json>] [-b <baseline.json>]
+'''
+
+import sys
+from getopt import getopt
+
+import opscli.ovsdb as ovsdb
+from tools import bench
+
+
+ITERATIONS = 200
+
+INTERFACE_COLUMNS = ['name', 'admin_state', 'link_state', 'link_speed']
+
+
+def bench_get():
+    return ovsdb.get('System', ['hostname'])
+
+
+def bench_get_map():
+    return ovsdb.get_map('System', 'other_config')
+
+
+def bench_map_set_key():
+    bench_map_set_key.count += 1
+    return ovsdb.map_set_key('System', 'other_config', 'bench_key',
+                             str(bench_map_set_key.count))
+bench_map_set_key.count = 0
+
+
+def bench_select_rows():
+    return ovsdb.get('Interface', INTERFACE_COLUMNS)
+
+
+def bench_get_rows():
+    return ovsdb.get_rows('Interface', INTERFACE_COLUMNS)
+
+
+def bench_large_reply():
+    return ovsdb.get('Interface')
+
+
+def bench_iter_rows():
+    return list(ovsdb.iter_rows('Interface'))
+
+
+def bench_vlans():
+    return ovsdb.get('VLAN')
+
+
+BENCHMARKS = (
+    ('get', bench_get),
+    ('get_map', bench_get_map),
+    ('map_set_key', bench_map_set_key),
+    ('select_rows', bench_select_rows),
+    ('get_rows', bench_get_rows),
+    ('large_reply', bench_large_reply),
+    ('iter_rows', bench_iter_rows),
+    ('vlans', bench_vlans),
+)
+
+COLUMNS = ('p50_ms', 'p99_ms', 'ops_per_sec', 'bytes_sent', 'bytes_received',
+           'objects')
+
+
+def run(scales, iterations):
+    counts = bench.count_bytes(ovsdb.Ovsdb)
+    results = {}
+    for scale in scales:
+        standin = bench.Standin(bench.SCALES[scale])
+        try:
+            ovsdb.Ovsdb(standin.server)
+            results[scale] = {}
+            for name, fn in BENCHMARKS:
+                results[scale][name] = bench.measure(fn, iterations, counts)
+        finally:
+            standin.stop()
+
+    return results
+
+
+def usage():
+    print "Usage: python -m tools.bench_ovsdb [-h] [-n <iterations>]"
+    print "               [-s <scale>,...] [-o <results file>]"
+    print "               [-b <baseline file>] [-t <threshold %>]"
+    print "Scales: %s" % ', '.join(sorted(bench.SCALES))
+    sys.exit()
+
+
+def main(args):
+    iterations = ITERATIONS
+    scales = ['small', 'medium', 'large']
+    output = baseline = None
+    threshold = bench.THRESHOLD
+    opts, args = getopt(args, 'hn:s:o:b:t:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-n':
+            iterations = int(arg)
+        elif opt == '-s':
+            scales = arg.split(',')
+            for scale in scales:
+                if scale not in bench.SCALES:
+                    usage()
+        elif opt == '-o':
+            output = arg
+        elif opt == '-b':
+            baseline = arg
+        elif opt == '-t':
+            threshold = float(arg) / 100
+
+    results = run(scales, iterations)
+    bench.print_results(results, COLUMNS)
+    # Every benchmark here talks to the server.
+    missing = bench.missing_bytes(results)
+    for scale, name in missing:
+        print "%s %s: no bytes counted" % (scale, name)
+    if missing:
+        sys.exit(1)
+    if output:
+        bench.save(output, {'environment': bench.environment(),
+                            'results': results})
+    if baseline:
+        print
+        changes = bench.compare(results, bench.load(baseline)['results'],
+                                threshold)
+        if bench.print_comparison(changes):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
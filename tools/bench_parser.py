@@ -0,0 +1,266 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Benchmark command lookup, option parsing, help and completion on
+generated command trees of increasing size.
+
+    python -m tools.bench_parser [-n <iterations>] [-s <tree>,...]
+                                 [-o <results.json>] [-b <baseline.json>]
+
+Every tree is loaded from generated command modules, in a process of its
+own, since a process can only hold one set of command trees.
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+from getopt import getopt
+from multiprocessing import Pool
+
+from tools import bench
+
+
+ITERATIONS = 1000
+COMMANDS_PER_MODULE = 100
+
+# commands: number of commands, all under 'show'
+# depth: number of words after 'show'
+# stanzas: number of options per command
+# choices: number of strings in each TString
+TREES = {
+    'small': {'commands': 100, 'depth': 2, 'stanzas': 2, 'choices': 8},
+    'medium': {'commands': 1000, 'depth': 3, 'stanzas': 4, 'choices': 32},
+    'large': {'commands': 5000, 'depth': 5, 'stanzas': 8, 'choices': 128},
+}
+
+# Each stanza is one of these, in turn.
+STANZA_KINDS = ('Opt_any_order', 'Opt_all_order', 'Opt_any', 'Opt_one')
+
+MODULE_HEADER = '''
+from opscli.command import *
+from opscli.options import *
+from opscli.tokens import *
+'''
+
+COMMAND_TEMPLATE = '''
+
+class %(name)s(Command):
+    \'\'\'Generated command %(index)d\'\'\'
+    command = '%(command)s'
+    options = (
+%(options)s
+    )
+
+    def run(self, opts, flags):
+        pass
+'''
+
+
+def command_words(index, tree):
+    '''The words of a generated command, after 'show'.'''
+    base = 2
+    while base ** tree['depth'] < tree['commands']:
+        base += 1
+    words = []
+    for level in range(tree['depth']):
+        words.append("n%d" % (index % base))
+        index //= base
+
+    return words
+
+
+def choices(stanza, tree):
+    results = []
+    for i in range(tree['choices']):
+        results.append("('s%02dc%04d', 'Choice %d')" % (stanza, i, i))
+    return "TString(%s)" % ', '.join(results)
+
+
+def stanza(number, tree):
+    '''Returns (option source, words that fill it in).'''
+    kind = STANZA_KINDS[number % len(STANZA_KINDS)]
+    keyword = "('s%02dkey', 'Keyword %d')" % (number, number)
+    choice = 's%02dc%04d' % (number, tree['choices'] - 1)
+    if kind == 'Opt_any_order':
+        source = "%s, TInteger()" % choices(number, tree)
+        words = [choice, '7']
+    elif kind == 'Opt_all_order':
+        source = "%s, %s" % (keyword, choices(number, tree))
+        words = ['s%02dkey' % number, choice]
+    elif kind == 'Opt_any':
+        source = "%s, ('s%02dother', 'Other')" % (keyword, number)
+        words = ['s%02dkey' % number]
+    else:
+        source = choices(number, tree)
+        words = [choice]
+
+    return "        %s(%s)," % (kind, source), words
+
+
+def write_modules(directory, tree):
+    '''Writes command modules for tree. Returns the words of the last
+    command, and the option words that fill in all its options.'''
+    option_sources = []
+    option_words = []
+    for number in range(tree['stanzas']):
+        source, words = stanza(number, tree)
+        option_sources.append(source)
+        option_words.extend(words)
+    f = None
+    for index in range(tree['commands']):
+        if index % COMMANDS_PER_MODULE == 0:
+            if f is not None:
+                f.close()
+            filename = "bench_synth_%d.py" % (index // COMMANDS_PER_MODULE)
+            f = open(os.path.join(directory, filename), 'w')
+            f.write(MODULE_HEADER)
+            names = []
+        name = "Synth_%d" % index
+        words = ['show'] + command_words(index, tree)
+        f.write(COMMAND_TEMPLATE % {
+            'name': name,
+            'index': index,
+            'command': ' '.join(words),
+            'options': '\n'.join(option_sources),
+        })
+        names.append(name)
+        if (index + 1) % COMMANDS_PER_MODULE == 0 or (index + 1 ==
+                                                      tree['commands']):
+            f.write("\n\nregister_commands((%s,))\n" % ', '.join(names))
+    f.close()
+
+    return words, option_words
+
+
+def run_tree(args):
+    '''Load a generated tree and time the parser on it, in a worker
+    process.'''
+    server, tree, iterations = args
+    from opscli.cli import Opscli
+    from opscli.context import context_get
+    from opscli.options import (tokenize_options, help_options,
+                                complete_options)
+    directory = tempfile.mkdtemp(prefix='opscli-bench-')
+    stdout = sys.stdout
+    try:
+        command, option_words = write_modules(directory, tree)
+        cli = Opscli(server, command_module_paths=[directory],
+                     interactive=False)
+        cmdtree = context_get().cmdtree
+        cmdobj = cli.find_command(cmdtree, command)[0]
+        words = command + option_words
+        line = ' '.join(words)
+        # Make sure the generated line parses.
+        cli.parse_command(list(words))
+
+        def complete():
+            cli.buffer = list(line[:-1])
+            cli.pos = len(cli.buffer)
+            cli.last_event = 'complete'
+            cli.complete(line[:-1])
+
+        benchmarks = (
+            ('find_command', lambda: cli.find_command(cmdtree, command)),
+            ('find_partial', lambda: cli.find_command(cmdtree,
+                                                      command[:2])),
+            ('tokenize_options', lambda: tokenize_options(option_words,
+                                                          cmdobj.options)),
+            ('parse_command', lambda: cli.parse_command(list(words))),
+            ('help_options', lambda: help_options(cmdobj, command)),
+            ('complete_options', lambda: complete_options(cmdobj, command +
+                                                          ['s00'])),
+            ('qhelp_root', lambda: cli.qhelp('')),
+            ('qhelp_show', lambda: cli.qhelp('show ')),
+            ('qhelp_options', lambda: cli.qhelp(' '.join(command) + ' ')),
+            ('complete', complete),
+        )
+        sys.stdout = open(os.devnull, 'w')
+        results = {}
+        for name, fn in benchmarks:
+            results[name] = bench.measure(fn, iterations)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(directory)
+
+    return results
+
+
+def run(trees, iterations):
+    standin = bench.Standin(bench.SCALES['small'])
+    results = {}
+    try:
+        for name in trees:
+            # A fresh process for every tree.
+            pool = Pool(processes=1, maxtasksperchild=1)
+            try:
+                results[name] = pool.apply(run_tree, ((standin.server,
+                                           TREES[name], iterations), ))
+            finally:
+                pool.terminate()
+                pool.join()
+    finally:
+        standin.stop()
+
+    return results
+
+
+def usage():
+    print "Usage: python -m tools.bench_parser [-h] [-n <iterations>]"
+    print "               [-s <tree>,...] [-o <results file>]"
+    print "               [-b <baseline file>] [-t <threshold %>]"
+    print "Trees: %s" % ', '.join(sorted(TREES))
+    sys.exit()
+
+
+def main(args):
+    iterations = ITERATIONS
+    trees = ['small', 'medium', 'large']
+    output = baseline = None
+    threshold = bench.THRESHOLD
+    opts, args = getopt(args, 'hn:s:o:b:t:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-n':
+            iterations = int(arg)
+        elif opt == '-s':
+            trees = arg.split(',')
+            for tree in trees:
+                if tree not in TREES:
+                    usage()
+        elif opt == '-o':
+            output = arg
+        elif opt == '-b':
+            baseline = arg
+        elif opt == '-t':
+            threshold = float(arg) / 100
+
+    results = run(trees, iterations)
+    bench.print_results(results, ('p50_ms', 'p99_ms', 'ops_per_sec',
+                                  'objects'), 'tree')
+    if output:
+        bench.save(output, {'environment': bench.environment(),
+                            'results': results})
+    if baseline:
+        print
+        changes = bench.compare(results, bench.load(baseline)['results'],
+                                threshold)
+        if bench.print_comparison(changes):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+Serve the OVSDB replies in a transcript recorded with ops-cli -r.
+
+Requests are matched on everything but their id. A request recorded more
+than once gets its replies in recorded order, starting over after the
+last one, so a transcript can be replayed any number of times.
+
+    python -m tools.replay [-s <server>] <transcript>...
+'''
+
+import sys
+import json
+from getopt import getopt
+
+from tools.standin import Standin_server, DEFAULT_SERVER
+
+
+def request_key(request):
+    request = dict(request)
+    request.pop('id', None)
+    return json.dumps(request, sort_keys=True)
+
+
+class Transcript:
+    def __init__(self, filenames):
+        self.schema = None
+        self.commands = []
+        # request key -> list of replies
+        self.replies = {}
+        for filename in filenames:
+            self.load(filename)
+
+    def load(self, filename):
+        f = open(filename)
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'schema' in record:
+                self.schema = record['schema']
+            elif 'command' in record:
+                self.commands.append(record['command'])
+            elif 'request' in record:
+                key = request_key(record['request'])
+                self.replies.setdefault(key, []).append(record['reply'])
+        f.close()
+
+
+class Replay_server(Standin_server):
+    def __init__(self, server, transcript):
+        Standin_server.__init__(self, server, None)
+        self.transcript = transcript
+        # request key -> index of the next reply
+        self.next_reply = {}
+
+    def handle(self, conn, msg):
+        if msg.get('method') is None:
+            return
+        key = request_key(msg)
+        replies = self.transcript.replies.get(key)
+        if replies is None:
+            if (msg['method'] == 'get_schema' and
+                    self.transcript.schema is not None):
+                self.reply(conn, msg, self.transcript.schema)
+                return
+            sys.stderr.write("Not in transcript: %s\n" % key)
+            self.reply(conn, msg, error='not in transcript')
+            return
+        index = self.next_reply.get(key, 0)
+        self.next_reply[key] = (index + 1) % len(replies)
+        reply = dict(replies[index])
+        reply['id'] = msg.get('id')
+        conn.send(reply)
+
+
+def usage():
+    print "Usage: python -m tools.replay [-h] [-s <server>] <transcript>..."
+    sys.exit()
+
+
+def main(args):
+    server = DEFAULT_SERVER
+    opts, args = getopt(args, 'hs:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-s':
+            server = arg
+    if not args:
+        usage()
+    transcript = Transcript(args)
+    replay = Replay_server(server, transcript)
+    print "Serving %d requests from %s on %s" % (len(transcript.replies),
+                                                 ', '.join(args), server)
+    sys.stdout.flush()
+    try:
+        replay.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        replay.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
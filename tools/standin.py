@@ -0,0 +1,805 @@
+#
+# Copyright (C) 2016 Bert Vermeulen <bert@biot.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+'''
+A stand-in for ovsdb-server, holding synthetic OpenSwitch data in memory.
+
+It speaks enough OVSDB JSON-RPC for the shell: transact (select, insert,
+update, mutate, delete, wait), monitor, monitor_cancel, echo, list_dbs and
+get_schema. Values are kept in wire format. A wait that is not satisfied
+fails at once instead of blocking until its timeout.
+
+    python -m tools.standin -s unix:/tmp/standin.sock -i 512 -v 4094
+'''
+
+import os
+import sys
+import json
+import uuid
+import copy
+import socket
+import operator
+import select
+from getopt import getopt
+from collections import OrderedDict
+
+
+DEFAULT_SERVER = 'unix:/tmp/opscli-standin.sock'
+DATABASE = 'OpenSwitch'
+RECV_SIZE = 65536
+
+COMPARE = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Default scale of the generated data.
+DEFAULT_SCALE = {
+    'interfaces': 52,
+    'vlans': 16,
+    'map_keys': 0,
+    'radius': 2,
+    'aliases': 2,
+}
+
+
+def string_map():
+    return {'key': 'string', 'value': 'string', 'min': 0, 'max': 'unlimited'}
+
+
+def optional(base):
+    return {'key': base, 'min': 0, 'max': 1}
+
+
+def reference(table, max_refs=1):
+    return {'key': {'type': 'uuid', 'refTable': table}, 'min': 0,
+            'max': max_refs}
+
+
+# The subset of the OpenSwitch schema used by the shell.
+SCHEMA = {
+    'name': DATABASE,
+    'version': '0.1.8-standin',
+    'tables': {
+        'System': {
+            'maxRows': 1,
+            'columns': {
+                'hostname': {'type': optional('string')},
+                'other_config': {'type': string_map()},
+                'status': {'type': string_map()},
+                'mgmt_intf_status': {'type': string_map()},
+                'aaa': {'type': string_map()},
+                'lacp_config': {'type': string_map()},
+                'logrotate_config': {'type': string_map()},
+            },
+        },
+        'Subsystem': {
+            'columns': {
+                'name': {'type': 'string'},
+                'other_info': {'type': string_map()},
+                'other_config': {'type': string_map()},
+            },
+        },
+        'Interface': {
+            'columns': {
+                'name': {'type': 'string'},
+                'admin_state': {'type': optional({'type': 'string',
+                                'enum': ['set', ['up', 'down']]})},
+                'link_state': {'type': optional({'type': 'string',
+                               'enum': ['set', ['up', 'down']]})},
+                'link_speed': {'type': optional('integer')},
+                'link_resets': {'type': optional('integer')},
+                'duplex': {'type': optional({'type': 'string',
+                           'enum': ['set', ['full', 'half']]})},
+                'mac_in_use': {'type': optional('string')},
+                'hw_intf_info': {'type': string_map()},
+                'other_config': {'type': string_map()},
+                'user_config': {'type': string_map()},
+                'lldp_statistics': {'type': {'key': 'string',
+                                    'value': 'integer', 'min': 0,
+                                    'max': 'unlimited'}},
+            },
+        },
+        'Port': {
+            'columns': {
+                'name': {'type': 'string'},
+                'interfaces': {'type': reference('Interface', 'unlimited')},
+                'vlan_tag': {'type': reference('VLAN')},
+                'vlan_trunks': {'type': reference('VLAN', 'unlimited')},
+            },
+        },
+        'VLAN': {
+            'columns': {
+                'id': {'type': {'key': {'type': 'integer', 'minInteger': 1,
+                                        'maxInteger': 4094}}},
+                'name': {'type': 'string'},
+                'admin': {'type': optional('string')},
+                'oper_state': {'type': optional('string')},
+                'oper_state_reason': {'type': optional('string')},
+            },
+        },
+        'Radius_Server': {
+            'columns': {
+                'ip_address': {'type': 'string'},
+                'passkey': {'type': optional('string')},
+                'udp_port': {'type': optional('integer')},
+                'priority': {'type': 'integer'},
+                'retries': {'type': optional('integer')},
+                'timeout': {'type': optional('integer')},
+            },
+        },
+        'CLI_Alias': {
+            'columns': {
+                'alias_name': {'type': 'string'},
+                'alias_definition': {'type': 'string'},
+            },
+        },
+    },
+}
+
+
+class EOperation(Exception):
+    '''An operation failed; the transaction is rolled back.'''
+    def __init__(self, error, details=''):
+        Exception.__init__(self, error)
+        self.error = error
+        self.details = details
+
+
+def column_type(column):
+    col_type = column['type']
+    if not isinstance(col_type, dict):
+        col_type = {'key': col_type}
+    return col_type
+
+
+def is_set(value, tag='set'):
+    return isinstance(value, list) and len(value) == 2 and value[0] == tag
+
+
+def hashable(atom):
+    if isinstance(atom, list):
+        return tuple(atom)
+    return atom
+
+
+def as_set(value):
+    '''Returns a set or map value as a frozenset of atoms, or of (key,
+    value) pairs for a map.'''
+    if is_set(value, 'map'):
+        return frozenset((hashable(k), hashable(v)) for k, v in value[1])
+    if is_set(value, 'set'):
+        return frozenset(hashable(a) for a in value[1])
+    return frozenset([hashable(value)])
+
+
+def from_set(atoms, is_map):
+    '''The inverse of as_set(), in the shortest wire format.'''
+    def wire(atom):
+        if isinstance(atom, tuple):
+            return list(atom)
+        return atom
+    if is_map:
+        return ['map', [[wire(k), wire(v)] for k, v in sorted(atoms)]]
+    if len(atoms) == 1:
+        return wire(list(atoms)[0])
+    return ['set', [wire(a) for a in sorted(atoms)]]
+
+
+def default_value(col_type):
+    if 'value' in col_type:
+        return ['map', []]
+    if col_type.get('min', 1) == 0:
+        return ['set', []]
+    base = col_type['key']
+    if isinstance(base, dict):
+        base = base['type']
+    return {
+        'integer': 0,
+        'real': 0.0,
+        'boolean': False,
+        'string': '',
+        'uuid': ['uuid', '00000000-0000-0000-0000-000000000000'],
+    }[base]
+
+
+def new_uuid():
+    return str(uuid.uuid4())
+
+
+class Database:
+    def __init__(self, schema=SCHEMA):
+        self.schema = schema
+        # table -> {uuid: row}, rows in wire format without _uuid, in
+        # insertion order.
+        self.tables = {}
+        for table in schema['tables']:
+            self.tables[table] = OrderedDict()
+
+    def columns(self, table):
+        if table not in self.tables:
+            raise EOperation('unknown table', "no table %s" % table)
+        return self.schema['tables'][table]['columns']
+
+    def col_type(self, table, column):
+        columns = self.columns(table)
+        if column not in columns:
+            raise EOperation('unknown column', "no column %s in %s" %
+                             (column, table))
+        return column_type(columns[column])
+
+    def value(self, table, uuid_str, row, column):
+        if column == '_uuid':
+            return ['uuid', uuid_str]
+        if column == '_version':
+            return ['uuid', row['_version']]
+        return row[column]
+
+    def matches(self, table, uuid_str, row, conditions):
+        for column, function, arg in conditions:
+            value = self.value(table, uuid_str, row, column)
+            if function == '==':
+                ok = as_set(value) == as_set(arg)
+            elif function == '!=':
+                ok = as_set(value) != as_set(arg)
+            elif function == 'includes':
+                ok = as_set(arg) <= as_set(value)
+            elif function == 'excludes':
+                ok = not (as_set(arg) & as_set(value))
+            elif function in COMPARE:
+                ok = COMPARE[function](value, arg)
+            else:
+                raise EOperation('syntax error', "bad function %s" % function)
+            if not ok:
+                return False
+        return True
+
+    def where(self, table, conditions):
+        self.columns(table)
+        for uuid_str, row in self.tables[table].items():
+            if self.matches(table, uuid_str, row, conditions):
+                yield uuid_str, row
+
+    def project(self, table, uuid_str, row, columns):
+        if columns is None:
+            columns = ['_uuid'] + sorted(row)
+        result = {}
+        for column in columns:
+            result[column] = self.value(table, uuid_str, row, column)
+        return result
+
+    def named(self, value, names):
+        '''Substitute named-uuid references with real UUIDs.'''
+        if isinstance(value, list):
+            if len(value) == 2 and value[0] == 'named-uuid':
+                if value[1] not in names:
+                    raise EOperation('referential integrity violation',
+                                     "unknown uuid-name %s" % value[1])
+                return ['uuid', names[value[1]]]
+            return [self.named(v, names) for v in value]
+        if isinstance(value, dict):
+            return dict((k, self.named(v, names)) for k, v in value.items())
+        return value
+
+    def check_column(self, table, column, value):
+        col_type = self.col_type(table, column)
+        key = col_type['key']
+        if isinstance(key, dict) and 'enum' in key:
+            allowed = key['enum'][1]
+            for atom in as_set(value):
+                if 'value' not in col_type and atom not in allowed:
+                    raise EOperation('constraint violation', "%r is not "
+                                     "allowed in %s:%s" % (atom, table,
+                                                           column))
+
+    def run(self, operations, undo, names):
+        '''Run one transaction's operations, recording old rows in undo.
+        Returns a list of results; raises EOperation on failure.'''
+        results = []
+        for operation in operations:
+            operation = self.named(operation, names)
+            handler = getattr(self, 'op_' + str(operation.get('op')), None)
+            if handler is None:
+                raise EOperation('unknown operation', str(operation.get('op')))
+            results.append(handler(operation, undo, names))
+        return results
+
+    def save(self, undo, table, uuid_str):
+        if (table, uuid_str) not in undo:
+            old = self.tables[table].get(uuid_str)
+            undo[(table, uuid_str)] = copy.deepcopy(old)
+
+    def op_select(self, operation, undo, names):
+        table = operation['table']
+        columns = operation.get('columns')
+        rows = []
+        for uuid_str, row in self.where(table, operation.get('where', [])):
+            rows.append(self.project(table, uuid_str, row, columns))
+        return {'rows': rows}
+
+    def op_insert(self, operation, undo, names):
+        table = operation['table']
+        uuid_str = new_uuid()
+        row = {}
+        for column, column_def in self.columns(table).items():
+            row[column] = default_value(column_type(column_def))
+        for column, value in operation.get('row', {}).items():
+            self.check_column(table, column, value)
+            row[column] = value
+        row['_version'] = new_uuid()
+        self.save(undo, table, uuid_str)
+        self.tables[table][uuid_str] = row
+        if 'uuid-name' in operation:
+            names[operation['uuid-name']] = uuid_str
+        return {'uuid': ['uuid', uuid_str]}
+
+    def op_update(self, operation, undo, names):
+        table = operation['table']
+        count = 0
+        for uuid_str, row in list(self.where(table, operation['where'])):
+            self.save(undo, table, uuid_str)
+            for column, value in operation['row'].items():
+                self.check_column(table, column, value)
+                row[column] = value
+            row['_version'] = new_uuid()
+            count += 1
+        return {'count': count}
+
+    def mutate_value(self, table, column, value, mutator, arg):
+        col_type = self.col_type(table, column)
+        if mutator in ('insert', 'delete'):
+            is_map = 'value' in col_type
+            current = as_set(value)
+            if mutator == 'insert':
+                if is_map:
+                    keys = set(k for k, v in current)
+                    added = [(k, v) for k, v in as_set(arg) if k not in keys]
+                    current = current | frozenset(added)
+                else:
+                    current = current | as_set(arg)
+            else:
+                if is_map and is_set(arg, 'map'):
+                    current = current - as_set(arg)
+                elif is_map:
+                    keys = as_set(arg)
+                    current = frozenset((k, v) for k, v in current
+                                        if k not in keys)
+                else:
+                    current = current - as_set(arg)
+            return from_set(current, is_map)
+        if not isinstance(value, (int, long, float)):
+            raise EOperation('constraint violation', "%s:%s is not a number" %
+                             (table, column))
+        if mutator == '+=':
+            return value + arg
+        if mutator == '-=':
+            return value - arg
+        if mutator == '*=':
+            return value * arg
+        if mutator in ('/=', '%='):
+            if arg == 0:
+                raise EOperation('domain error', 'division by zero')
+            if mutator == '/=':
+                return value / arg
+            return value % arg
+        raise EOperation('syntax error', "bad mutator %s" % mutator)
+
+    def op_mutate(self, operation, undo, names):
+        table = operation['table']
+        count = 0
+        for uuid_str, row in list(self.where(table, operation['where'])):
+            self.save(undo, table, uuid_str)
+            for column, mutator, arg in operation['mutations']:
+                row[column] = self.mutate_value(table, column, row[column],
+                                                mutator, arg)
+            row['_version'] = new_uuid()
+            count += 1
+        return {'count': count}
+
+    def op_delete(self, operation, undo, names):
+        table = operation['table']
+        count = 0
+        for uuid_str, row in list(self.where(table, operation['where'])):
+            self.save(undo, table, uuid_str)
+            del self.tables[table][uuid_str]
+            count += 1
+        return {'count': count}
+
+    def op_wait(self, operation, undo, names):
+        table = operation['table']
+        columns = operation['columns']
+        found = []
+        for uuid_str, row in self.where(table, operation.get('where', [])):
+            found.append(json.dumps(self.project(table, uuid_str, row,
+                                                 columns), sort_keys=True))
+        expected = []
+        for row in operation['rows']:
+            expected.append(json.dumps(row, sort_keys=True))
+        equal = sorted(found) == sorted(expected)
+        if equal != (operation.get('until', '==') == '=='):
+            raise EOperation('timed out')
+        return {}
+
+    def rollback(self, undo):
+        for (table, uuid_str), old in undo.items():
+            if old is None:
+                self.tables[table].pop(uuid_str, None)
+            else:
+                self.tables[table][uuid_str] = old
+
+    def transact(self, operations):
+        '''Returns (results, changes), where changes maps (table, uuid) to
+        the old row for every row the transaction touched.'''
+        undo = {}
+        names = {}
+        results = []
+        for operation in operations:
+            try:
+                results.extend(self.run([operation], undo, names))
+            except EOperation as e:
+                self.rollback(undo)
+                results.append({'error': e.error, 'details': e.details})
+                return results, {}
+            except (KeyError, TypeError, ValueError) as e:
+                self.rollback(undo)
+                results.append({'error': 'syntax error', 'details': str(e)})
+                return results, {}
+        return results, undo
+
+
+class Monitor:
+    def __init__(self, monitor_id, requests):
+        self.id = monitor_id
+        # table -> columns, or None for all columns
+        self.tables = {}
+        for table, request in requests.items():
+            if isinstance(request, list):
+                request = request[0] if request else {}
+            self.tables[table] = request.get('columns')
+
+    def initial(self, db):
+        updates = {}
+        for table, columns in self.tables.items():
+            rows = {}
+            for uuid_str, row in db.where(table, []):
+                rows[uuid_str] = {'new': db.project(table, uuid_str, row,
+                                                    columns)}
+            if rows:
+                updates[table] = rows
+        return updates
+
+    def changes(self, db, undo):
+        updates = {}
+        for (table, uuid_str), old in undo.items():
+            if table not in self.tables:
+                continue
+            columns = self.tables[table]
+            change = {}
+            if old is not None:
+                change['old'] = db.project(table, uuid_str, old, columns)
+            new = db.tables[table].get(uuid_str)
+            if new is not None:
+                change['new'] = db.project(table, uuid_str, new, columns)
+            if change:
+                updates.setdefault(table, {})[uuid_str] = change
+        return updates
+
+
+class Connection:
+    def __init__(self, sock):
+        self.socket = sock
+        self.data = ''
+        self.monitors = {}
+
+    def send(self, msg):
+        self.socket.sendall(json.dumps(msg))
+
+    def messages(self):
+        '''Yields the complete messages received so far.'''
+        decoder = json.JSONDecoder()
+        while True:
+            self.data = self.data.lstrip()
+            if not self.data:
+                return
+            try:
+                msg, end = decoder.raw_decode(self.data)
+            except ValueError:
+                # Incomplete.
+                return
+            self.data = self.data[end:]
+            yield msg
+
+
+class Standin_server:
+    def __init__(self, server, db):
+        self.server = server
+        self.db = db
+        self.connections = {}
+        self.listener = listen(server)
+
+    def reply(self, conn, msg, result=None, error=None):
+        conn.send({'id': msg.get('id'), 'result': result, 'error': error})
+
+    def handle(self, conn, msg):
+        method = msg.get('method')
+        params = msg.get('params', [])
+        if method is None:
+            # A reply to one of our echo requests; ignore it.
+            return
+        if method == 'echo':
+            self.reply(conn, msg, params)
+        elif method == 'list_dbs':
+            self.reply(conn, msg, [DATABASE])
+        elif method == 'get_schema':
+            if params != [DATABASE]:
+                self.reply(conn, msg, error='unknown database')
+            else:
+                self.reply(conn, msg, self.db.schema)
+        elif method == 'transact':
+            if not params or params[0] != DATABASE:
+                self.reply(conn, msg, error='unknown database')
+                return
+            results, undo = self.db.transact(params[1:])
+            self.reply(conn, msg, results)
+            if undo:
+                self.notify(undo)
+        elif method == 'monitor':
+            if len(params) != 3 or params[0] != DATABASE:
+                self.reply(conn, msg, error='syntax error')
+                return
+            monitor = Monitor(params[1], params[2])
+            conn.monitors[json.dumps(params[1])] = monitor
+            self.reply(conn, msg, monitor.initial(self.db))
+        elif method == 'monitor_cancel':
+            key = json.dumps(params[0] if params else None)
+            if key not in conn.monitors:
+                self.reply(conn, msg, error='unknown monitor')
+            else:
+                del conn.monitors[key]
+                self.reply(conn, msg, {})
+        else:
+            self.reply(conn, msg, error='unknown method')
+
+    def notify(self, undo):
+        for conn in self.connections.values():
+            for monitor in conn.monitors.values():
+                updates = monitor.changes(self.db, undo)
+                if updates:
+                    conn.send({'id': None, 'method': 'update',
+                               'params': [monitor.id, updates]})
+
+    def drop(self, fd):
+        self.connections.pop(fd).socket.close()
+
+    def serve(self):
+        poller = select.poll()
+        poller.register(self.listener, select.POLLIN)
+        while True:
+            for fd, event in poller.poll():
+                if fd == self.listener.fileno():
+                    sock, address = self.listener.accept()
+                    self.connections[sock.fileno()] = Connection(sock)
+                    poller.register(sock, select.POLLIN)
+                    continue
+                conn = self.connections[fd]
+                try:
+                    chunk = conn.socket.recv(RECV_SIZE)
+                except socket.error:
+                    chunk = ''
+                if not chunk:
+                    poller.unregister(fd)
+                    self.drop(fd)
+                    continue
+                conn.data += chunk
+                try:
+                    for msg in conn.messages():
+                        self.handle(conn, msg)
+                except socket.error:
+                    poller.unregister(fd)
+                    self.drop(fd)
+
+    def close(self):
+        for fd in list(self.connections):
+            self.drop(fd)
+        self.listener.close()
+        if self.server.startswith('unix:'):
+            os.unlink(self.server[5:])
+
+
+def listen(server):
+    parts = server.split(':')
+    if parts[0] == 'unix' and len(parts) == 2:
+        if os.path.exists(parts[1]):
+            os.unlink(parts[1])
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(parts[1])
+    elif parts[0] == 'tcp' and len(parts) == 3 and parts[2].isdigit():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((parts[1], int(parts[2])))
+    else:
+        raise Exception("Invalid server %s" % server)
+    sock.listen(64)
+
+    return sock
+
+
+def wire_map(data):
+    return ['map', [[k, v] for k, v in sorted(data.items())]]
+
+
+def extra_keys(count):
+    '''Filler keys for large maps.'''
+    data = {}
+    for i in range(count):
+        data['standin_key_%d' % i] = 'value %d' % i
+    return data
+
+
+def populate(db, interfaces=52, vlans=16, map_keys=0, radius=2, aliases=2):
+    '''Fill db with a switch of the given scale. map_keys filler keys are
+    added to every other_config map.'''
+    def insert(table, row, name=None):
+        operation = {'op': 'insert', 'table': table, 'row': row}
+        if name is not None:
+            operation['uuid-name'] = name
+        return operation
+
+    ops = []
+    other_config = extra_keys(map_keys)
+    other_config.update({
+        'lldp_enable': 'true',
+        'lldp_hold': '4',
+        'lldp_tx_interval': '30',
+        'min_internal_vlan': '1024',
+        'max_internal_vlan': '4094',
+        'internal_vlan_policy': 'ascending',
+    })
+    ops.append(insert('System', {
+        'hostname': 'standin',
+        'other_config': wire_map(other_config),
+        'status': wire_map({}),
+        'mgmt_intf_status': wire_map({
+            'hostname': 'standin',
+            'link_state': 'up',
+            'ip': '192.168.0.2',
+            'subnet_mask': '24',
+            'default_gateway': '192.168.0.1',
+            'ipv6_linklocal': 'fe80::1/64',
+        }),
+        'aaa': wire_map({'radius': 'false', 'fallback': 'true'}),
+        'lacp_config': wire_map({'lacp-system-priority': '65534'}),
+        'logrotate_config': wire_map({'period': 'daily', 'maxsize': '10'}),
+    }))
+    ops.append(insert('Subsystem', {
+        'name': 'base',
+        'other_info': wire_map({
+            'Product Name': 'Standin',
+            'Vendor': 'opscli',
+            'Platform': 'x86_64',
+            'interface_count': str(interfaces),
+            'max_interface_speed': '10000',
+        }),
+        'other_config': wire_map({'fan_speed': 'normal'}),
+    }))
+    for vid in range(1, vlans + 1):
+        ops.append(insert('VLAN', {
+            'id': vid,
+            'name': 'VLAN%d' % vid,
+            'admin': 'up',
+            'oper_state': 'up',
+            'oper_state_reason': 'ok',
+        }, 'vlan%d' % vid))
+    for i in range(1, interfaces + 1):
+        name = str(i)
+        intf_config = dict(other_config)
+        if i % 4 == 0:
+            intf_config['lldp_enable_dir'] = 'rx'
+        ops.append(insert('Interface', {
+            'name': name,
+            'admin_state': 'up' if i % 2 else 'down',
+            'link_state': 'up' if i % 3 else 'down',
+            'link_speed': 10000000000,
+            'link_resets': i % 7,
+            'duplex': 'full',
+            'mac_in_use': '70:72:cf:%02x:%02x:%02x' % ((i >> 16) & 0xff,
+                                                       (i >> 8) & 0xff,
+                                                       i & 0xff),
+            'hw_intf_info': wire_map({
+                'connector': 'SFP_PLUS',
+                'max_speed': '10000',
+                'pluggable': 'true',
+            }),
+            'other_config': wire_map(intf_config),
+            'lldp_statistics': ['map', [['lldp_insert', i * 3],
+                                        ['lldp_delete', i],
+                                        ['lldp_drop', i % 2],
+                                        ['lldp_ageout', i % 5]]],
+        }, 'intf%d' % i))
+        row = {
+            'name': name,
+            'interfaces': ['set', [['named-uuid', 'intf%d' % i]]],
+        }
+        if vlans:
+            row['vlan_tag'] = ['named-uuid', 'vlan%d' % ((i % vlans) + 1)]
+            trunks = []
+            for vid in range(1, min(vlans, 4) + 1):
+                trunks.append(['named-uuid', 'vlan%d' % vid])
+            row['vlan_trunks'] = ['set', trunks]
+        ops.append(insert('Port', row))
+    for i in range(radius):
+        ops.append(insert('Radius_Server', {
+            'ip_address': '10.%d.%d.%d' % ((i >> 16) & 0xff, (i >> 8) & 0xff,
+                                           (i & 0xff) + 1),
+            'passkey': 'secret%d' % i,
+            'udp_port': 1812,
+            'priority': i + 1,
+            'retries': 3,
+            'timeout': 5,
+        }))
+    for i in range(aliases):
+        ops.append(insert('CLI_Alias', {
+            'alias_name': 'alias%d' % i,
+            'alias_definition': 'show interface %d' % (i + 1),
+        }))
+    results, undo = db.transact(ops)
+    for result in results:
+        if 'error' in result:
+            raise Exception("populate failed: %s %s" % (result['error'],
+                            result['details']))
+
+
+def usage():
+    print "Usage: python -m tools.standin [-h] [-s <server>] [-i <interfaces>]"
+    print "               [-v <vlans>] [-m <map keys>] [-r <radius servers>]"
+    print "               [-a <aliases>]"
+    sys.exit()
+
+
+def main(args):
+    server = DEFAULT_SERVER
+    scale = dict(DEFAULT_SCALE)
+    options = {
+        '-i': 'interfaces',
+        '-v': 'vlans',
+        '-m': 'map_keys',
+        '-r': 'radius',
+        '-a': 'aliases',
+    }
+    opts, args = getopt(args, 'hs:i:v:m:r:a:')
+    for opt, arg in opts:
+        if opt == '-h':
+            usage()
+        elif opt == '-s':
+            server = arg
+        else:
+            scale[options[opt]] = int(arg)
+    db = Database()
+    populate(db, **scale)
+    standin = Standin_server(server, db)
+    print "Serving %s on %s" % (', '.join("%d %s" % (scale[k], k)
+                                for k in sorted(scale)), server)
+    sys.stdout.flush()
+    try:
+        standin.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])